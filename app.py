@@ -1,14 +1,42 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, url_for
 import time
 import random
 import asyncio
+import json
 import os
+import shutil
+import threading
+from urllib.parse import quote, urlparse
 
 # Import your sitemap generation and validation logic
+from scripts.artifact_store import ArtifactStore
 from scripts.comprehensive_sitemap import ComprehensiveFinploySitemap
 from scripts.sitemap_validator import SitemapValidator
+from scripts.http_cache import HttpCache
+from scripts.jobs import JobManager
+from scripts.metrics import METRICS
+from scripts.results_store import STATUS_FILTERS, ValidationResultsStore, result_row
+from scripts.validation_report import ValidationReportWriter, read_report_page, read_report_summary
+from scripts.url_index import canonicalize_url
 
 app = Flask(__name__)
+# Behind Apache/lighttpd, let the web server stream downloads straight from disk (X-Sendfile)
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE') == '1'
+
+# Crawl checkpoints, so a generation interrupted by a worker timeout resumes on retry
+CRAWL_STATE_DIR = os.path.join(os.getcwd(), '.crawl_state')
+# Each site is generated in its own directory, so concurrent jobs never write to each other's files
+SITES_DIR = os.path.join(CRAWL_STATE_DIR, 'sites')
+# Serializes copying a finished sitemap into the working directory as the latest one
+latest_sitemap_lock = threading.Lock()
+# ETag/Last-Modified + extracted links per URL, shared by generation and validation
+http_cache = HttpCache(os.path.join(CRAWL_STATE_DIR, 'http_cache.sqlite'))
+# Crawls and validations run here instead of in the request thread
+job_manager = JobManager(max_workers=int(os.environ.get('JOB_WORKERS', 2)))
+# Latest validation results per sitemap version, read by the results page instead of re-validating
+results_store = ValidationResultsStore(ttl=int(os.environ.get('VALIDATION_RESULTS_TTL', 3600)))
+# Immutable, content-addressed copies of every sitemap and report served for download
+artifact_store = ArtifactStore(os.path.join(os.getcwd(), '.artifacts'))
 
 @app.route('/')
 def index():
@@ -18,36 +46,115 @@ def index():
 def developer_info():
     return render_template('developer_info.html')
 
+def run_sitemap_generation(website_url, job):
+    """Background job: crawl the site and write its sitemap"""
+    start_time = time.time()
+    generator = ComprehensiveFinploySitemap(base_url=website_url, http_cache=http_cache)
+    site = urlparse(website_url).netloc or 'site'
+    state_file = os.path.join(CRAWL_STATE_DIR, f"{site}.sqlite")
+    # The sitemap, its shards, index and diff are written here; it also holds the previous
+    # sitemap the next incremental run of this site reads back
+    site_dir = os.path.join(SITES_DIR, site)
+    os.makedirs(site_dir, exist_ok=True)
+    # Incremental: unchanged pages keep their lastmod and pages still within their changefreq aren't refetched
+    sitemap_file, url_count = generator.create_comprehensive_sitemap(
+        os.path.join(site_dir, "comprehensive_sitemap.xml"), index_filename=os.path.join(site_dir, "sitemap_index.xml"),
+        state_file=state_file, progress=job.progress_tracker('crawl'), incremental=True)
+    sitemap_file = os.path.basename(sitemap_file)
+    # Published under its content hash, so a later run can't change the file under this job's download link
+    # (built by hand: jobs run outside the request context url_for needs)
+    versions = [artifact_store.publish(path) for path in generator.last_files]
+    install_latest_sitemap(generator.last_files)
+    end_time = time.time()
+    time_taken = round(end_time - start_time, 2)
+
+    # Since the original script doesn't return sample URLs, we'll simulate them
+    # or you can modify comprehensive_sitemap.py to return them if allowed.
+    # For now, using a simple simulation based on the generated count.
+    sample_urls = [f"{website_url}/sample-page-{i}" for i in range(1, min(6, url_count + 1))]
+    if url_count > 5:
+        sample_urls.append(f"... and {url_count - 5} more.")
+
+    return {
+        "status": "success",
+        "total_urls": url_count,
+        "time_taken": time_taken,
+        "sample_urls": sample_urls,
+        "saved_file": sitemap_file,
+        "download_url": f"/download_sitemap/{quote(sitemap_file)}?version={versions[-1]['digest']}",
+        "changes": generator.last_diff,
+        "metrics": generator.metrics.snapshot()
+    }
+
+def install_latest_sitemap(paths):
+    """Copy a finished run's files into the working directory, where validation and unversioned downloads read them"""
+    with latest_sitemap_lock:
+        for path in paths:
+            target = os.path.join(os.getcwd(), os.path.basename(path))
+            shutil.copyfile(path, target + '.tmp')
+            os.replace(target + '.tmp', target)
+
+def report_file_for(sitemap_file):
+    return f"validation_report_{sitemap_file.replace('.xml', '')}.jsonl"
+
+def run_sitemap_validation(sitemap_file_to_validate, job):
+    """Background job: validate every URL in a sitemap, writing the report as results arrive"""
+    start_time = time.time()
+    # Taken before validating, so a sitemap regenerated mid-run doesn't inherit these results
+    store_key = results_store.key_for(sitemap_file_to_validate)
+    validator = SitemapValidator(sitemap_file_to_validate, http_cache=http_cache)
+
+    with ValidationReportWriter(report_file_for(sitemap_file_to_validate), sitemap_file_to_validate,
+                                metrics=validator.metrics) as report_writer:
+        # Jobs run on their own worker thread, so they get a private event loop. Rows go straight
+        # to the report; nothing per URL is kept in memory
+        asyncio.run(validator.validate_all_urls(
+            sink=report_writer.write, keep_results=False, progress=job.progress_tracker('validate')))
+    report = report_writer.report()
+    report_version = artifact_store.publish(report['report_file'])
+    if store_key is not None:
+        # Indexed over the published copy, which never changes under the results page's offsets
+        results_store.put(store_key, sitemap_file_to_validate, report_version['path'], report['summary'])
+    end_time = time.time()
+    time_taken = round(end_time - start_time, 2)
+
+    # A handful of rows for the dashboard; the rest is paged from /validation_results
+    sample_rows, _ = read_report_page(report_version['path'], limit=5)
+    sample_validated_urls = [result_row(row['url'], row) for row in sample_rows]
+    if report['total_urls'] > 5:
+        sample_validated_urls.append({"url": None, "status_text": f"... and {report['total_urls'] - 5} more."})
+
+    return {
+        "total_tested": report['summary']['accessible'] + report['summary']['errors'],
+        "successful": report['summary']['accessible'],
+        "errors": report['summary']['errors'],
+        "redirects": report['summary']['redirects'],
+        "time_taken": time_taken,
+        "sample_validated_urls": sample_validated_urls,
+        "saved_file": report['report_file'],
+        "download_url": f"/download_validation_report/{quote(report['report_file'])}?version={report_version['digest']}",
+        "metrics": report['metrics']
+    }
+
+def job_accepted(job, created):
+    """202 response pointing the client at the job's status endpoint"""
+    return jsonify({
+        "status": job.status,
+        "job_id": job.id,
+        "deduplicated": not created,
+        "status_url": url_for('job_status', job_id=job.id),
+        "events_url": url_for('job_events', job_id=job.id),
+        "cancel_url": url_for('cancel_job', job_id=job.id)
+    }), 202
+
 @app.route('/generate_sitemap_action', methods=['POST'])
 def generate_sitemap_action():
     website_url = request.form.get('website_url')
     if not website_url:
         return jsonify({"status": "error", "error": "Website URL is required."}), 400
 
-    try:
-        start_time = time.time()
-        generator = ComprehensiveFinploySitemap(base_url=website_url)
-        sitemap_file, url_count = generator.create_comprehensive_sitemap()
-        end_time = time.time()
-        time_taken = round(end_time - start_time, 2)
-
-        # Since the original script doesn't return sample URLs, we'll simulate them
-        # or you can modify comprehensive_sitemap.py to return them if allowed.
-        # For now, using a simple simulation based on the generated count.
-        sample_urls = [f"{website_url}/sample-page-{i}" for i in range(1, min(6, url_count + 1))]
-        if url_count > 5:
-            sample_urls.append(f"... and {url_count - 5} more.")
-
-        return jsonify({
-            "status": "success",
-            "total_urls": url_count,
-            "time_taken": time_taken,
-            "sample_urls": sample_urls,
-            "saved_file": sitemap_file
-        })
-    except Exception as e:
-        print(f"Error during sitemap generation: {e}")
-        return jsonify({"status": "error", "error": str(e)}), 500
+    job, created = job_manager.submit('generate', canonicalize_url(website_url), run_sitemap_generation, website_url)
+    return job_accepted(job, created)
 
 @app.route('/validate_sitemap_action', methods=['POST'])
 def validate_sitemap_action():
@@ -56,48 +163,51 @@ def validate_sitemap_action():
     if not os.path.exists(sitemap_file_to_validate):
         return jsonify({"status": "error", "error": f"Sitemap file '{sitemap_file_to_validate}' not found. Please generate it first."}), 404
 
+    job, created = job_manager.submit('validate', sitemap_file_to_validate, run_sitemap_validation, sitemap_file_to_validate)
+    return job_accepted(job, created)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": "Unknown job id."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events stream of a job's progress, ending with a 'done' event"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": "Unknown job id."}), 404
+    # Reconnecting EventSources send Last-Event-ID; replay whatever the ring buffer still holds after it
     try:
-        start_time = time.time()
-        validator = SitemapValidator(sitemap_file_to_validate)
-        
-        # Run the async validation in a synchronous Flask route
-        validation_results_dict = asyncio.run(validator.validate_all_urls())
-        report = validator.generate_validation_report(f"validation_report_{sitemap_file_to_validate.replace('.xml', '')}.json")
-        end_time = time.time()
-        time_taken = round(end_time - start_time, 2)
-
-        # Prepare sample and full results for the frontend
-        sample_validated_urls = []
-        full_validated_urls = []
-        count = 0
-        for url, result in validation_results_dict.items():
-            status_text = f"{result['status']} {'OK' if result['accessible'] else 'Error'}"
-            if result.get('redirect'):
-                status_text += " (Redirect)"
-            
-            item = {"url": url, "status_text": status_text, "status_code": result['status'], "accessible": result['accessible'], "redirect": result.get('redirect', False)}
-            full_validated_urls.append(item)
-
-            if count < 5:
-                sample_validated_urls.append(item)
-            count += 1
-        
-        if len(validation_results_dict) > 5:
-            sample_validated_urls.append({"url": None, "status_text": f"... and {len(validation_results_dict) - 5} more."})
-
-        return jsonify({
-            "total_tested": report['summary']['accessible'] + report['summary']['errors'],
-            "successful": report['summary']['accessible'],
-            "errors": report['summary']['errors'],
-            "redirects": report['summary']['redirects'],
-            "time_taken": time_taken,
-            "sample_validated_urls": sample_validated_urls,
-            "full_validated_urls": full_validated_urls, # Send all results for the new page
-            "saved_file": report['sitemap_file']
-        })
-    except Exception as e:
-        print(f"Error during sitemap validation: {e}")
-        return jsonify({"status": "error", "error": str(e)}), 500
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+    except ValueError:
+        # A malformed id can't be resumed from; start from the oldest event still buffered
+        last_id = 0
+
+    def stream(last_id):
+        while True:
+            if job.done and last_id >= job.last_event_id:
+                return
+            events = job.events_since(last_id, timeout=15)
+            if not events:
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event_type, data in events:
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+                last_id = event_id
+
+    return Response(stream(last_id), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "error": "Unknown job id."}), 404
+    job.cancel()
+    return jsonify(job.to_dict(include_result=False)), 202
 
 @app.route('/full_validation_results')
 def full_validation_results():
@@ -106,46 +216,127 @@ def full_validation_results():
         # Handle case where sitemap isn't generated yet
         return render_template('full_validation_results.html', results=[], error="Sitemap not found. Please generate it first.")
 
+    status_filter = request.args.get('status', 'all')
+    page = request.args.get('page', 1, type=int)
+    per_page = min(max(request.args.get('per_page', 100, type=int), 1), 1000)
+
+    entry = results_store.get(sitemap_file_to_validate)
+    if entry is None:
+        # Missing, expired or for an older sitemap: validate in the background rather than in this request
+        job, _ = job_manager.submit('validate', sitemap_file_to_validate, run_sitemap_validation, sitemap_file_to_validate)
+        return render_template('full_validation_results.html', results=[], pending_job=job)
+
     try:
-        validator = SitemapValidator(sitemap_file_to_validate)
-        validation_results_dict = asyncio.run(validator.validate_all_urls())
-        
-        full_results_for_template = []
-        for url, result in validation_results_dict.items():
-            status_text = f"{result['status']} {'OK' if result['accessible'] else 'Error'}"
-            if result.get('redirect'):
-                status_text += " (Redirect)"
-            full_results_for_template.append({
-                "url": url,
-                "status_text": status_text,
-                "accessible": result['accessible'],
-                "redirect": result.get('redirect', False)
-            })
-        return render_template('full_validation_results.html', results=full_results_for_template)
-    except Exception as e:
-        print(f"Error retrieving full validation results: {e}")
-        return render_template('full_validation_results.html', results=[], error=f"Error loading results: {str(e)}")
+        results, total = entry.page(status_filter, page, per_page)
+    except ValueError as e:
+        return render_template('full_validation_results.html', results=[], error=str(e)), 400
+
+    return render_template(
+        'full_validation_results.html',
+        results=results,
+        counts=entry.counts(),
+        status_filter=status_filter,
+        status_filters=STATUS_FILTERS,
+        page=page,
+        per_page=per_page,
+        total=total,
+        pages=max((total + per_page - 1) // per_page, 1),
+        validated_at=time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry.created_at)),
+    )
+
+
+@app.route('/validation_results')
+def validation_results_api():
+    """
+    Cursor-paginated rows of a validation report, read straight from the JSONL file.
+    Pages come from the published copy, which a later validation never rewrites; the
+    cursor is "<digest>:<offset>" and stops working once a newer report is published.
+    """
+    report_file = os.path.basename(request.args.get('report') or report_file_for("comprehensive_sitemap.xml"))
+    if not (report_file.startswith('validation_report') and report_file.endswith('.jsonl')):
+        return jsonify({"status": "error", "error": f"Validation report '{report_file}' not found. Please validate a sitemap first."}), 404
+    version = artifact_store.resolve(report_file)
+    if version is not None:
+        path, digest = version['path'], version['digest']
+    elif os.path.exists(report_file):
+        # Written outside the web app (e.g. by the scripts) and never published; page it as it is
+        path, digest = report_file, None
+    else:
+        return jsonify({"status": "error", "error": f"Validation report '{report_file}' not found. Please validate a sitemap first."}), 404
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+
+    cursor = request.args.get('cursor')
+    if cursor and digest:
+        cursor_digest, _, cursor = cursor.rpartition(':')
+        if not cursor_digest:
+            return jsonify({"status": "error", "error": f"Invalid cursor {request.args['cursor']!r}"}), 400
+        if cursor_digest != digest:
+            return jsonify({"status": "error", "error": "The validation report has changed since this cursor was issued; "
+                                                        "start again without a cursor."}), 409
+    try:
+        rows, next_cursor = read_report_page(path, cursor, limit, request.args.get('status', 'all'))
+    except ValueError as e:
+        return jsonify({"status": "error", "error": str(e)}), 400
+    if next_cursor and digest:
+        next_cursor = f"{digest}:{next_cursor}"
+
+    response = read_report_summary(path)
+    response.update({"report_file": report_file, "results": rows, "next_cursor": next_cursor})
+    return jsonify(response)
+
+@app.route('/metrics')
+def metrics():
+    """Per-phase latency histograms for every crawl and validation since startup"""
+    if request.args.get('format') == 'prometheus':
+        return Response(METRICS.prometheus(), mimetype='text/plain; version=0.0.4')
+    return jsonify(METRICS.snapshot())
+
+def send_artifact(filename):
+    """
+    Serve a published sitemap or report: strong ETag (the content hash), 304 on If-None-Match,
+    Range requests, and the precompressed .gz to clients that accept gzip. ?version=<digest>
+    pins one immutable version, which may then be cached for good.
+    """
+    filename = os.path.basename(filename)
+    version_digest = request.args.get('version')
+    version = artifact_store.resolve(filename, version_digest)
+    if version is None:
+        if version_digest:
+            return "File not found", 404
+        # Written outside the web app (e.g. by the scripts) and never published; serve it as it is
+        file_path = os.path.join(os.getcwd(), filename)
+        if not os.path.isfile(file_path):
+            return "File not found", 404
+        return send_file(file_path, as_attachment=True, conditional=True)
 
+    path, etag, gzipped = version['path'], version['digest'], False
+    if version['gzip_path'] and request.accept_encodings['gzip'] and os.path.exists(version['gzip_path']):
+        # Each encoding is a different representation, so it needs its own ETag
+        path, etag, gzipped = version['gzip_path'], etag + '-gzip', True
+    response = send_file(path, as_attachment=True, download_name=filename, conditional=True, etag=etag,
+                         max_age=31536000 if version_digest else 0)
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    if version_digest:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
 
 @app.route('/download_sitemap/<filename>')
 def download_sitemap(filename):
     # IMPORTANT: In a Vercel deployment, files saved locally are ephemeral.
     # You would need to serve this from persistent storage like Vercel Blob.
     # For local development, this works.
-    file_path = os.path.join(os.getcwd(), filename) # Assumes sitemap.xml is in root
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
-    return "File not found", 404
+    return send_artifact(filename)
 
 @app.route('/download_validation_report/<filename>')
 def download_validation_report(filename):
     # IMPORTANT: In a Vercel deployment, files saved locally are ephemeral.
     # You would need to serve this from persistent storage like Vercel Blob.
     # For local development, this works.
-    file_path = os.path.join(os.getcwd(), filename) # Assumes report.json is in root
-    if os.path.exists(file_path):
-        return send_file(file_path, as_attachment=True)
-    return "File not found", 404
+    return send_artifact(filename)
 
 if __name__ == '__main__':
     app.run(debug=True)
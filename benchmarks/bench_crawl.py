@@ -0,0 +1,324 @@
+"""
+Benchmark the crawler, sitemap generator and validator against a local mock Finploy site.
+
+Usage:
+    python benchmarks/bench_crawl.py [--latency-ms 20] [--error-rate 0.02] [--json results.json]
+    python benchmarks/bench_crawl.py --compare results.json   # fail if throughput regressed
+
+A synthetic site is served from its own process on 127.0.0.1. Its pages are
+the URL shapes from generate_comprehensive_urls (dept x city listings,
+city and department pages, static pages, pagination), a share of which are
+missing (404) like on the real site, as are some whole URL patterns, plus
+job detail pages that can only be found by following links. Every page also
+links to a /search page that robots.txt disallows, and /sitemap.xml lists a
+share of the live pages. The link graph, page sizes, latency and error rate
+are configurable and seeded, so two runs with the same options crawl the same
+site. --no-discover crawls without reading robots.txt or /sitemap.xml.
+
+Each stage runs in a fresh process so its peak RSS is its own:
+    crawl     crawl_and_validate over the lazily generated seeds
+    sitemap   create_comprehensive_sitemap end to end
+    validate  validate_all_urls over the sitemap the previous stage wrote
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import http.server
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.comprehensive_sitemap import ComprehensiveFinploySitemap
+from scripts.sitemap_validator import SitemapValidator
+
+STAGES = ('crawl', 'sitemap', 'validate')
+# The latency histogram each stage's p50/p99 is read from
+STAGE_HISTOGRAMS = {'crawl': 'crawl.fetch', 'sitemap': 'crawl.fetch', 'validate': 'validate.url'}
+
+
+def _fraction(seed, key):
+    """A stable number in [0, 1) for a page, so the same pages are missing on every run"""
+    digest = hashlib.blake2b(f"{seed}:{key}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') / 2 ** 64
+
+
+class MockSite:
+    """
+    The pages of a synthetic Finploy site, keyed by path (with query string).
+
+    Each seed family (URL pattern) is missing entirely with probability
+    dead_family_rate, and each remaining seed URL with probability
+    missing_rate; missing pages answer 404. Every other page links to
+    links_per_page random live pages and to jobs_per_listing job detail pages
+    of its own, and is padded to page_kb kilobytes. /sitemap.xml lists
+    sitemap_share of the pages; robots.txt disallows /search.
+    """
+
+    def __init__(self, seed=1, missing_rate=0.3, links_per_page=20, jobs_per_listing=2, page_kb=40,
+                 dead_family_rate=0.0, sitemap_share=0.5):
+        self.page_kb = page_kb
+        # Only the seed patterns are needed from the generator, and they are built relative to the host
+        families = ComprehensiveFinploySitemap("http://mock.invalid").seed_families()
+        seed_paths, live = [], []
+        for name, urls in families:
+            dead = name != '/' and _fraction(seed, name) < dead_family_rate
+            for path in map(self._path, urls):
+                seed_paths.append(path)
+                if path == '/' or (not dead and _fraction(seed, path) >= missing_rate):
+                    live.append(path)
+
+        self.pages = {}
+        detail_pages = []
+        for path in live:
+            if '-jobs-in-' in path:
+                jobs = [f"/job/{path.strip('/')}-{n}" for n in range(jobs_per_listing)]
+                detail_pages.extend(jobs)
+                self.pages[path] = jobs
+            else:
+                self.pages[path] = []
+        for path in detail_pages:
+            self.pages[path] = []
+
+        rng = random.Random(seed)
+        every_page = sorted(self.pages)
+        for path, links in self.pages.items():
+            links.extend(rng.sample(every_page, min(links_per_page, len(every_page))))
+        self.seed_count = len(seed_paths)
+        self.listed = [path for path in every_page if _fraction(seed, 'sitemap:' + path) < sitemap_share]
+
+    @staticmethod
+    def _path(url):
+        parts = urlsplit(url)
+        return (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+    def render(self, path):
+        """The HTML for a page, or None when it does not exist"""
+        links = self.pages.get(path)
+        if links is None:
+            return None
+        parts = [f'<html><head><title>{path}</title></head><body><nav>',
+                 '<a href="/">Home</a><a href="/jobs">Jobs</a><a href="mailto:hr@finploy.com">Mail</a>',
+                 f'<a href="/search?q={path.strip("/").replace("/", "-")}">Search</a></nav><ul>']
+        for link in links:
+            parts.append(f'<li class="job-card"><a href="{link}">{link.strip("/")}</a></li>')
+        parts.append('</ul>')
+        body = ''.join(parts)
+        padding = self.page_kb * 1024 - len(body) - len('</body></html>')
+        if padding > 0:
+            filler = '<p>Relationship Manager, competitive salary, 2-5 yrs experience.</p>'
+            body += (filler * (padding // len(filler) + 1))[:padding]
+        return (body + '</body></html>').encode('utf-8')
+
+    @staticmethod
+    def robots(host):
+        return (f"User-agent: *\nDisallow: /search\n\nSitemap: http://{host}/sitemap.xml\n").encode('utf-8')
+
+    def sitemap(self, host):
+        entries = ''.join(f"<url><loc>http://{host}{path}</loc></url>" for path in self.listed)
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>').encode('utf-8')
+
+
+def make_handler(site, latency_ms, jitter_ms, error_rate):
+    class MockFinployHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so the clients' connection pools are exercised
+        # Headers and body go out in separate writes; without TCP_NODELAY every keep-alive
+        # GET would wait out the client's delayed ACK (~40 ms) and hide the crawler's own latency
+        disable_nagle_algorithm = True
+
+        def _respond(self, send_body):
+            time.sleep((latency_ms + random.uniform(0, jitter_ms)) / 1000)
+            content_type = 'text/html; charset=utf-8'
+            if self.path == '/robots.txt':
+                status, body, content_type = 200, site.robots(self.headers['Host']), 'text/plain'
+            elif self.path == '/sitemap.xml':
+                status, body, content_type = 200, site.sitemap(self.headers['Host']), 'application/xml'
+            elif random.random() < error_rate:
+                status, body = 500, b'<html><body>Internal Server Error</body></html>'
+            else:
+                body = site.render(self.path)
+                status = 200 if body is not None else 404
+                body = body if body is not None else b'<html><body>Not Found</body></html>'
+            if status == 200 and self.headers.get('Range') == 'bytes=0-0':
+                status, body = 206, body[:1]
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            self._respond(send_body=True)
+
+        def do_HEAD(self):
+            self._respond(send_body=False)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockFinployHandler
+
+
+class MockServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop idle keep-alive connections when a stage ends; that is not worth a traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def serve(options, ready):
+    """Server process: build the site, report (port, page count) and serve until terminated"""
+    site = MockSite(options['seed'], options['missing_rate'], options['links_per_page'],
+                    options['jobs_per_listing'], options['page_kb'], options['dead_family_rate'],
+                    options['sitemap_share'])
+    handler = make_handler(site, options['latency_ms'], options['jitter_ms'], options['error_rate'])
+    server = MockServer(('127.0.0.1', 0), handler)
+    ready.put((server.server_address[1], len(site.pages), site.seed_count))
+    server.serve_forever()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_stage(stage, base_url, options, workdir):
+    """Runs in its own process; returns the stage's measurements"""
+    sitemap_file = os.path.join(workdir, 'mock_sitemap.xml')
+    with contextlib.redirect_stdout(open(os.devnull, 'w')) if not options['verbose'] else contextlib.nullcontext():
+        start = time.perf_counter()
+        if stage == 'crawl':
+            generator = ComprehensiveFinploySitemap(base_url)
+            found = len(generator.crawl_and_validate([], seeds=generator.prioritized_seeds(),
+                                                     max_urls_to_discover=options['max_urls'],
+                                                     max_workers=options['workers'],
+                                                     crawl_delay=options['crawl_delay'],
+                                                     discover=options['discover']))
+            metrics = generator.metrics
+        elif stage == 'sitemap':
+            generator = ComprehensiveFinploySitemap(base_url)
+            _, found = generator.create_comprehensive_sitemap(
+                sitemap_file, index_filename=os.path.join(workdir, 'mock_sitemap_index.xml'),
+                max_urls_to_discover=options['max_urls'], crawl_delay=options['crawl_delay'],
+                discover=options['discover'])
+            metrics = generator.metrics
+        else:
+            validator = SitemapValidator(sitemap_file)
+            asyncio.run(validator.validate_all_urls(max_concurrent=options['workers'], keep_results=False))
+            found = validator.summary['accessible']
+            metrics = validator.metrics
+        elapsed = time.perf_counter() - start
+
+    latency = metrics.snapshot().get(STAGE_HISTOGRAMS[stage], {})
+    requests_made = latency.get('count', 0)
+    return {
+        'stage': stage,
+        'seconds': round(elapsed, 3),
+        'requests': requests_made,
+        'urls_found': found,
+        'throughput': round(requests_made / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(latency.get('p50', 0.0) * 1000, 2),
+        'p99_ms': round(latency.get('p99', 0.0) * 1000, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def compare(results, baseline_file, tolerance):
+    """Print regressions against a saved run; returns True when there are none"""
+    with open(baseline_file) as f:
+        baseline = {row['stage']: row for row in json.load(f)['results']}
+    ok = True
+    for row in results:
+        before = baseline.get(row['stage'])
+        if not before or not before['throughput']:
+            continue
+        change = row['throughput'] / before['throughput'] - 1
+        if change < -tolerance:
+            ok = False
+            print(f"❌ {row['stage']}: throughput {before['throughput']} -> {row['throughput']} req/s ({change:+.0%})")
+        else:
+            print(f"✅ {row['stage']}: throughput {before['throughput']} -> {row['throughput']} req/s ({change:+.0%})")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    site = parser.add_argument_group('mock site')
+    site.add_argument('--seed', type=int, default=1)
+    site.add_argument('--missing-rate', type=float, default=0.3, help="share of seed URLs that are 404")
+    site.add_argument('--dead-family-rate', type=float, default=0.2,
+                      help="share of seed URL patterns that are missing altogether")
+    site.add_argument('--links-per-page', type=int, default=20)
+    site.add_argument('--jobs-per-listing', type=int, default=2, help="job detail pages linked from each listing")
+    site.add_argument('--page-kb', type=int, default=40)
+    site.add_argument('--sitemap-share', type=float, default=0.5, help="share of pages listed in /sitemap.xml")
+    site.add_argument('--latency-ms', type=float, default=20.0)
+    site.add_argument('--jitter-ms', type=float, default=10.0)
+    site.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 500")
+    run = parser.add_argument_group('run')
+    run.add_argument('--stages', default=','.join(STAGES), help="comma-separated subset of " + ', '.join(STAGES))
+    run.add_argument('--max-urls', type=int, default=1000)
+    run.add_argument('--workers', type=int, default=10)
+    run.add_argument('--crawl-delay', type=float, default=0.0, help="0 disables the per-host rate limit")
+    run.add_argument('--no-discover', dest='discover', action='store_false',
+                     help="ignore the mock's robots.txt and /sitemap.xml")
+    run.add_argument('--json', help="write the results to this file")
+    run.add_argument('--compare', help="results file from an earlier run to check against")
+    run.add_argument('--tolerance', type=float, default=0.15, help="throughput drop that counts as a regression")
+    run.add_argument('--verbose', action='store_true', help="show the crawler's and validator's own output")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    if 'validate' in stages and 'sitemap' not in stages:
+        sys.exit("The validate stage checks the sitemap written by the sitemap stage; include both")
+    options = vars(args)
+
+    # Spawned children start clean, so each stage's peak RSS is not inherited from this process
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    server = context.Process(target=serve, args=(options, ready), daemon=True)
+    server.start()
+    try:
+        port, page_count, seed_count = ready.get(timeout=60)
+        base_url = f"http://127.0.0.1:{port}"
+        print(f"🧪 Mock site at {base_url}: {page_count} pages, {seed_count} seed URLs "
+              f"({args.missing_rate:.0%} missing, {args.dead_family_rate:.0%} of patterns dead), {args.page_kb} KB/page, "
+              f"{args.latency_ms:g}+{args.jitter_ms:g} ms latency, {args.error_rate:.0%} errors")
+
+        results = []
+        with tempfile.TemporaryDirectory() as workdir, context.Pool(1, maxtasksperchild=1) as pool:
+            for stage in stages:
+                row = pool.apply(run_stage, (stage, base_url, options, workdir))
+                results.append(row)
+                print(f"{stage:>9}: {row['seconds']:7.2f}s  {row['requests']:6d} req  {row['throughput']:8.1f} req/s  "
+                      f"p50 {row['p50_ms']:7.2f} ms  p99 {row['p99_ms']:7.2f} ms  "
+                      f"peak RSS {row['peak_rss_mb']:6.1f} MB  ({row['urls_found']} URLs)")
+    finally:
+        server.terminate()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': options, 'results': results}, f, indent=2)
+        print(f"💾 Results saved to {args.json}")
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
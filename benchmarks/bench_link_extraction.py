@@ -0,0 +1,93 @@
+"""
+Benchmark the streaming link extractor against the BeautifulSoup path.
+
+Usage:
+    python benchmarks/bench_link_extraction.py [saved_pages_dir] [--rounds N]
+
+Point it at a directory of saved Finploy pages (*.html, e.g. "Save page as..."
+or `curl -o`). Without one, a synthetic page shaped like a Finploy listing
+page is used so the benchmark still runs offline.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.link_extractor import SoupLinkExtractor, StreamingLinkExtractor
+
+BASE_URL = "https://www.finploy.com"
+
+
+def synthetic_page(links=400):
+    """A listing page with nav, inline scripts and many job links"""
+    parts = ['<html><head><title>Jobs</title><style>a{color:red}</style>',
+             '<script>var tpl = "<a href=/not-a-link>";</script></head><body><nav>']
+    for page in ['/jobs', '/careers', '/companies', '/about', '/contact']:
+        parts.append(f'<a class="nav-link" href="{page}">{page}</a>')
+    parts.append('</nav><!-- <a href="/commented-out"> --><ul>')
+    for i in range(links):
+        parts.append(
+            f'<li class="job-card"><div><h3><a href="/sales-loans-jobs-in-city-{i}?ref=list&amp;p={i % 7}" '
+            f'title="Job {i}">Relationship Manager {i}</a></h3><p>Competitive salary, {i % 15} yrs</p>'
+            f'<a href="mailto:hr{i}@finploy.com">Mail</a><a href="#apply-{i}">Apply</a>'
+            f'<a href="https://www.linkedin.com/company/finploy-{i}">LinkedIn</a></div></li>'
+        )
+    parts.append('</ul><footer><a href=/privacy-policy>Privacy</a></footer></body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def load_pages(directory):
+    if not directory:
+        return [("synthetic", synthetic_page())]
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.htm*'))):
+        with open(path, 'rb') as f:
+            pages.append((os.path.basename(path), f.read()))
+    if not pages:
+        sys.exit(f"No .html files found in {directory}")
+    return pages
+
+
+def run(extractor, pages, rounds):
+    start = time.perf_counter()
+    total_links = 0
+    for _ in range(rounds):
+        for _, body in pages:
+            total_links += len(extractor.extract(BASE_URL + "/", body))
+    return time.perf_counter() - start, total_links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pages_dir', nargs='?', help="directory of saved *.html pages")
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    total_bytes = sum(len(body) for _, body in pages)
+    domain = BASE_URL.split('://', 1)[1]
+    streaming = StreamingLinkExtractor(domain)
+    soup = SoupLinkExtractor(domain)
+
+    # Both backends must agree before their speed means anything
+    for name, body in pages:
+        fast, slow = set(streaming.extract(BASE_URL + "/", body)), set(soup.extract(BASE_URL + "/", body))
+        if fast != slow:
+            print(f"⚠️ {name}: extractors disagree (+{len(fast - slow)} / -{len(slow - fast)} links)")
+
+    print(f"📄 {len(pages)} page(s), {total_bytes / 1024:.1f} KB, {args.rounds} rounds")
+    results = {}
+    for label, extractor in (('BeautifulSoup', soup), ('streaming', streaming)):
+        elapsed, links = run(extractor, pages, args.rounds)
+        results[label] = elapsed
+        pages_per_sec = len(pages) * args.rounds / elapsed
+        mb_per_sec = total_bytes * args.rounds / elapsed / (1024 * 1024)
+        print(f"{label:>14}: {elapsed:.3f}s  {pages_per_sec:8.1f} pages/s  {mb_per_sec:6.2f} MB/s  ({links} links)")
+    print(f"🚀 Speedup: {results['BeautifulSoup'] / results['streaming']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
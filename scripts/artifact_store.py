@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for generated sitemaps and validation reports.
+
+    Publishing a file copies it to objects/<digest[:2]>/<digest><ext> (plus a
+    precompressed .gz next to it) in one streaming pass, then points
+    refs/<name>.json at that digest with an atomic rename. Objects are never
+    modified once written, so a download that is in progress keeps reading
+    the version it started with while a newer run publishes over the same
+    name, and the digest doubles as a strong ETag. The last `keep` versions
+    of each name stay resolvable by digest.
+    """
+
+    def __init__(self, root, keep=5):
+        self.root = root
+        self.keep = keep
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'refs'), exist_ok=True)
+
+    def _object_path(self, digest, ext):
+        return os.path.join(self.root, 'objects', digest[:2], digest + ext)
+
+    def _ref_path(self, name):
+        return os.path.join(self.root, 'refs', os.path.basename(name) + '.json')
+
+    def _read_ref(self, name):
+        try:
+            with open(self._ref_path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def publish(self, path, name=None):
+        """Store the file at `path` under `name` (its basename by default); returns the new version"""
+        name = os.path.basename(name or path)
+        ext = name[name.index('.'):] if '.' in name else ''
+        already_compressed = name.endswith('.gz')
+
+        staging = os.path.join(self.root, 'objects')
+        digest = hashlib.sha256()
+        size = 0
+        raw_fd, raw_tmp = tempfile.mkstemp(dir=staging, suffix='.tmp')
+        gz_tmp = None if already_compressed else raw_tmp + '.gz'
+        try:
+            with open(path, 'rb') as source, os.fdopen(raw_fd, 'wb') as raw:
+                compressed = gzip.open(gz_tmp, 'wb') if gz_tmp else None
+                try:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                        digest.update(chunk)
+                        size += len(chunk)
+                        raw.write(chunk)
+                        if compressed:
+                            compressed.write(chunk)
+                finally:
+                    if compressed:
+                        compressed.close()
+
+            digest = digest.hexdigest()
+            object_path = self._object_path(digest, ext)
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if os.path.exists(object_path):
+                # Same content as a version already stored
+                os.remove(raw_tmp)
+                if gz_tmp:
+                    os.remove(gz_tmp)
+            else:
+                if gz_tmp:
+                    os.replace(gz_tmp, object_path + '.gz')
+                os.replace(raw_tmp, object_path)
+        except BaseException:
+            for leftover in (raw_tmp, gz_tmp):
+                if leftover and os.path.exists(leftover):
+                    os.remove(leftover)
+            raise
+
+        version = {
+            'name': name,
+            'digest': digest,
+            'size': size,
+            'path': object_path,
+            'gzip_path': object_path + '.gz' if gz_tmp else None,
+            'published_at': time.time(),
+        }
+        with self.lock:
+            ref = self._read_ref(name) or {'name': name, 'versions': []}
+            versions = [version] + [v for v in ref['versions'] if v['digest'] != digest]
+            ref['versions'], expired = versions[:self.keep], versions[self.keep:]
+            ref_tmp = self._ref_path(name) + '.tmp'
+            with open(ref_tmp, 'w') as f:
+                json.dump(ref, f)
+            os.replace(ref_tmp, self._ref_path(name))
+            self._collect(expired)
+        return version
+
+    def _collect(self, expired):
+        """Delete expired versions' objects unless another name still refers to the same content"""
+        if not expired:
+            return
+        live = set()
+        refs_dir = os.path.join(self.root, 'refs')
+        for ref_file in os.listdir(refs_dir):
+            if ref_file.endswith('.json'):
+                ref = self._read_ref(ref_file[:-len('.json')])
+                live.update(v['path'] for v in (ref or {}).get('versions', []))
+        for version in expired:
+            if version['path'] in live:
+                continue
+            for path in (version['path'], version.get('gzip_path')):
+                if path and os.path.exists(path):
+                    os.remove(path)
+
+    def resolve(self, name, digest=None):
+        """The latest version of `name`, or the version with `digest`; None when unknown"""
+        ref = self._read_ref(name)
+        if not ref:
+            return None
+        for version in ref['versions']:
+            if (digest is None or version['digest'] == digest) and os.path.exists(version['path']):
+                return version
+        return None
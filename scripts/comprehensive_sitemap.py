@@ -1,291 +1,501 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
-import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import json
+import os
 import time
 import threading
-import collections # For deque
+
+try:
+    from scripts.crawl_engine import AsyncCrawlEngine
+    from scripts.crawl_frontier import FilteredFrontier, MemoryFrontier, SQLiteFrontier
+    from scripts.discovery import ROBOTS_CACHE, RobotsDisallowed, fetch_sitemap_urls
+    from scripts.http_cache import HttpCache
+    from scripts.link_extractor import create_link_extractor
+    from scripts.metrics import METRICS, MetricsRegistry
+    from scripts.parse_pipeline import ParsePipeline
+    from scripts.seed_generator import PrioritizedSeeds
+    from scripts.sitemap_reader import read_sitemap_entries
+    from scripts.sitemap_writer import StreamingSitemapWriter
+    from scripts.url_classifier import UrlClassifier
+    from scripts.url_index import canonicalize_url
+except ImportError:  # running as `python scripts/comprehensive_sitemap.py`
+    from crawl_engine import AsyncCrawlEngine
+    from crawl_frontier import FilteredFrontier, MemoryFrontier, SQLiteFrontier
+    from discovery import ROBOTS_CACHE, RobotsDisallowed, fetch_sitemap_urls
+    from http_cache import HttpCache
+    from link_extractor import create_link_extractor
+    from metrics import METRICS, MetricsRegistry
+    from parse_pipeline import ParsePipeline
+    from seed_generator import PrioritizedSeeds
+    from sitemap_reader import read_sitemap_entries
+    from sitemap_writer import StreamingSitemapWriter
+    from url_classifier import UrlClassifier
+    from url_index import canonicalize_url
+
+# How long a page of each changefreq is trusted before an incremental run asks the server again
+CHANGEFREQ_SECONDS = {
+    'always': 0,
+    'hourly': 3600,
+    'daily': 24 * 3600,
+    'weekly': 7 * 24 * 3600,
+    'monthly': 30 * 24 * 3600,
+    'yearly': 365 * 24 * 3600,
+}
+
+# Real Finploy departments from the provided images
+DEPARTMENTS = [
+    'sales-loans',
+    'sales-casa-deposits-mfs',
+    'sales-corporate-institutional',
+    'sales-life-insurance',
+    'sales-general-insurance',
+    'collections',
+    'credit-department',
+    'technology-digital',
+    'hr-training',
+    'legal-compliance-risk',
+    'operations-loans-underwrtg-disb-mis',
+    'operations-central-support',
+    'operations-banking',
+    'investment-banking-pe-vc',
+    'broking-trading-asset-wealth-mgt',
+    'treasury-forex',
+    'trading-commod-crypto-others',
+    'others-emerging',
+    'marketing',
+    'finance-accounts-taxation'
+]
+
+# Extended list of Indian cities (50+ cities to reach 800+ URLs), biggest first
+CITIES = [
+    # Tier 1 cities
+    'mumbai', 'delhi', 'bangalore', 'hyderabad', 'chennai', 'kolkata', 'pune',
+    # Tier 2 cities
+    'ahmedabad', 'jaipur', 'lucknow', 'kanpur', 'nagpur', 'indore', 'thane',
+    'bhopal', 'visakhapatnam', 'patna', 'vadodara', 'ghaziabad', 'ludhiana',
+    'agra', 'nashik', 'faridabad', 'meerut', 'rajkot', 'varanasi', 'srinagar',
+    'aurangabad', 'dhanbad', 'amritsar', 'allahabad', 'ranchi', 'howrah',
+    'coimbatore', 'jabalpur', 'gwalior', 'vijayawada', 'jodhpur', 'madurai',
+    'raipur', 'kota', 'guwahati', 'chandigarh', 'solapur', 'hubli-dharwad',
+    'bareilly', 'moradabad', 'mysore', 'gurgaon', 'aligarh', 'jalandhar',
+    'tiruchirappalli', 'bhubaneswar', 'salem', 'warangal', 'thiruvananthapuram',
+    'bhiwandi', 'saharanpur', 'gorakhpur', 'guntur', 'bikaner', 'amravati',
+    'noida', 'jamshedpur', 'bhilai', 'cuttack', 'firozabad', 'kochi', 'nellore'
+]
+
+EXPERIENCE_LEVELS = ['fresher', 'experienced', 'senior', 'manager', 'executive', 'entry-level']
+SALARY_TYPES = ['high-salary', 'competitive-salary', 'attractive-package']
+STATIC_PAGES = [
+    '/jobs', '/careers', '/companies', '/employers', '/job-seekers',
+    '/about', '/contact', '/services', '/solutions', '/products',
+    '/blog', '/news', '/resources', '/help', '/support', '/faq',
+    '/privacy-policy', '/terms-conditions', '/sitemap', '/login', '/register'
+]
 
 class ComprehensiveFinploySitemap:
-    def __init__(self, base_url="https://www.finploy.com"):
-        self.base_url = base_url
-        self.domain = urlparse(base_url).netloc
+    def __init__(self, base_url="https://www.finploy.com", http_cache=None, link_extractor='streaming',
+                 classifier=None):
+        self.base_url = canonicalize_url(base_url)
+        # Priority/changefreq/sort tier per URL; pass a UrlClassifier with custom keywords and rules to change them
+        self.classifier = classifier or UrlClassifier(self.base_url)
+        self.http_cache = http_cache
+        self.domain = urlparse(self.base_url).netloc
+        self.link_extractor_kind = link_extractor
+        self.link_extractor = create_link_extractor(self.domain, link_extractor)
         self.discovered_urls = set()
         self.lock = threading.Lock()
 
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
-        # Set to keep track of URLs that have been added to the queue or processed
+        }
+        # This generator's phase timings; also added to the process-wide totals
+        self.metrics = MetricsRegistry(parent=METRICS)
+        # URLs that have been added to the queue or processed (the crawl frontier once crawling)
         self.processed_or_queued_urls = set()
+        # Added/removed/changed counts from the last incremental run
+        self.last_diff = None
+        # Every file the last run wrote: the sitemap or its shards, then the index when there is one
+        self.last_files = []
 
-    def generate_comprehensive_urls(self):
-        """Generate comprehensive URL list based on real Finploy structure"""
-        urls = {self.base_url}
-
-        # Real Finploy departments from the provided images
-        departments = [
-            'sales-loans',
-            'sales-casa-deposits-mfs',
-            'sales-corporate-institutional',
-            'sales-life-insurance',
-            'sales-general-insurance',
-            'collections',
-            'credit-department',
-            'technology-digital',
-            'hr-training',
-            'legal-compliance-risk',
-            'operations-loans-underwrtg-disb-mis',
-            'operations-central-support',
-            'operations-banking',
-            'investment-banking-pe-vc',
-            'broking-trading-asset-wealth-mgt',
-            'treasury-forex',
-            'trading-commod-crypto-others',
-            'others-emerging',
-            'marketing',
-            'finance-accounts-taxation'
-        ]
-
-        # Extended list of Indian cities (50+ cities to reach 800+ URLs)
-        cities = [
-            # Tier 1 cities
-            'mumbai', 'delhi', 'bangalore', 'hyderabad', 'chennai', 'kolkata', 'pune',
-            # Tier 2 cities
-            'ahmedabad', 'jaipur', 'lucknow', 'kanpur', 'nagpur', 'indore', 'thane',
-            'bhopal', 'visakhapatnam', 'patna', 'vadodara', 'ghaziabad', 'ludhiana',
-            'agra', 'nashik', 'faridabad', 'meerut', 'rajkot', 'varanasi', 'srinagar',
-            'aurangabad', 'dhanbad', 'amritsar', 'allahabad', 'ranchi', 'howrah',
-            'coimbatore', 'jabalpur', 'gwalior', 'vijayawada', 'jodhpur', 'madurai',
-            'raipur', 'kota', 'guwahati', 'chandigarh', 'solapur', 'hubli-dharwad',
-            'bareilly', 'moradabad', 'mysore', 'gurgaon', 'aligarh', 'jalandhar',
-            'tiruchirappalli', 'bhubaneswar', 'salem', 'warangal', 'thiruvananthapuram',
-            'bhiwandi', 'saharanpur', 'gorakhpur', 'guntur', 'bikaner', 'amravati',
-            'noida', 'jamshedpur', 'bhilai', 'cuttack', 'firozabad', 'kochi', 'nellore'
-        ]
-
-        print(f"🏢 Using {len(departments)} real Finploy departments")
-        print(f"🏙️ Using {len(cities)} Indian cities")
-
-        # 1. Department + City combinations (20 depts × 60 cities = 1200 URLs)
-        for dept in departments:
-            for city in cities:
-                urls.add(f"{self.base_url}/{dept}-jobs-in-{city}")
+    def _expand(self, pattern, values):
+        """Lazily fill the '*' in a path pattern with each value"""
+        return (self.base_url + pattern.replace('*', value) for value in values)
+
+    def seed_families(self):
+        """
+        The speculative seed URLs based on real Finploy structure, as lazy
+        (family, urls) pairs. A family is one URL pattern, named with '*' in
+        place of the part that varies, e.g. '/sales-loans-jobs-in-*'.
+        """
+        yield '/', [self.base_url]
+
+        # 1. Department + City combinations (20 depts × 69 cities = 1380 URLs)
+        for dept in DEPARTMENTS:
+            yield f"/{dept}-jobs-in-*", self._expand(f"/{dept}-jobs-in-*", CITIES)
 
         # 2. Location-based job URLs
-        for city in cities:
-            urls.add(f"{self.base_url}/jobs-in-{city}")
-            urls.add(f"{self.base_url}/careers-in-{city}")
+        for pattern in ('/jobs-in-*', '/careers-in-*'):
+            yield pattern, self._expand(pattern, CITIES)
 
         # 3. Department-only URLs
-        for dept in departments:
-            urls.add(f"{self.base_url}/{dept}-jobs")
-            urls.add(f"{self.base_url}/jobs/{dept}")
-            urls.add(f"{self.base_url}/careers/{dept}")
-
-        # 4. Experience level combinations
-        experience_levels = ['fresher', 'experienced', 'senior', 'manager', 'executive', 'entry-level']
-        for exp in experience_levels:
-            for city in cities[:15]:  # Top 15 cities
-                urls.add(f"{self.base_url}/{exp}-jobs-in-{city}")
-
-        # 5. Salary-based URLs
-        salary_types = ['high-salary', 'competitive-salary', 'attractive-package']
-        for salary in salary_types:
-            for city in cities[:10]:
-                urls.add(f"{self.base_url}/{salary}-jobs-in-{city}")
+        for pattern in ('/*-jobs', '/jobs/*', '/careers/*'):
+            yield pattern, self._expand(pattern, DEPARTMENTS)
+
+        # 4. Experience level combinations (top 15 cities)
+        for exp in EXPERIENCE_LEVELS:
+            yield f"/{exp}-jobs-in-*", self._expand(f"/{exp}-jobs-in-*", CITIES[:15])
+
+        # 5. Salary-based URLs (top 10 cities)
+        for salary in SALARY_TYPES:
+            yield f"/{salary}-jobs-in-*", self._expand(f"/{salary}-jobs-in-*", CITIES[:10])
 
         # 6. Company and static pages
-        static_pages = [
-            '/jobs', '/careers', '/companies', '/employers', '/job-seekers',
-            '/about', '/contact', '/services', '/solutions', '/products',
-            '/blog', '/news', '/resources', '/help', '/support', '/faq',
-            '/privacy-policy', '/terms-conditions', '/sitemap', '/login', '/register'
-        ]
+        yield '/*', self._expand('*', STATIC_PAGES)
 
-        for page in static_pages:
-            urls.add(f"{self.base_url}{page}")
+        # 7. Pagination URLs (pages 2-10)
+        for pattern in ('/jobs?page=*', '/careers?page=*'):
+            yield pattern, self._expand(pattern, map(str, range(2, 11)))
 
-        # 7. Pagination URLs (common patterns)
-        for page_num in range(2, 11):  # Pages 2-10
-            urls.add(f"{self.base_url}/jobs?page={page_num}")
-            urls.add(f"{self.base_url}/careers?page={page_num}")
+    def prioritized_seeds(self, min_samples=8, min_hit_rate=0.1):
+        """
+        The seed families as a PrioritizedSeeds, ordered by sitemap tier. A family
+        whose first min_samples fetched seeds are less than min_hit_rate accessible
+        is dropped without generating the rest.
+        """
+        print(f"🏢 Using {len(DEPARTMENTS)} real Finploy departments")
+        print(f"🏙️ Using {len(CITIES)} Indian cities")
+        return PrioritizedSeeds(self.seed_families(), self.sort_tier,
+                                min_samples=min_samples, min_hit_rate=min_hit_rate)
 
+    def generate_comprehensive_urls(self):
+        """Generate comprehensive URL list based on real Finploy structure"""
+        urls = {url for _, family in self.seed_families() for url in family}
         print(f"📊 Generated {len(urls)} potential URLs")
         return urls
 
-    def fetch_and_extract_links(self, url):
-        """
-        Fetches a URL, extracts internal links, and returns the URL if accessible.
-        Returns (accessible_url, list_of_new_internal_links) or (None, []).
-        """
-        try:
-            response = self.session.get(url, timeout=5) # Increased timeout slightly
-            # Check for successful response and HTML content type
-            if response.status_code == 200 and 'text/html' in response.headers.get('Content-Type', ''):
-                soup = BeautifulSoup(response.text, 'html.parser')
-                internal_links = []
-                for link in soup.find_all('a', href=True):
-                    absolute_url = urljoin(url, link['href'])
-                    parsed_absolute_url = urlparse(absolute_url)
-
-                    # Ensure it's the same domain and not already processed/queued
-                    if parsed_absolute_url.netloc == self.domain and \
-                       absolute_url not in self.processed_or_queued_urls:
-                        # Filter out common non-content links like mailto, tel, #anchors
-                        if not absolute_url.startswith(('mailto:', 'tel:', '#')):
-                            internal_links.append(absolute_url)
-                return url, internal_links
-            else:
-                return None, []
-        except requests.exceptions.RequestException:
-            # Handle connection errors, timeouts, etc.
-            return None, []
-
-    def crawl_and_validate(self, initial_urls, max_urls_to_discover=1000, max_workers=10, crawl_delay=0.1):
+    def extract_links(self, page_url, body, encoding=None):
+        """Extract every same-domain link from a page (the result is cached, so it is not deduplicated here)"""
+        return self.link_extractor.extract(page_url, body, encoding)
+
+    async def crawl_and_validate_async(self, initial_urls, max_urls_to_discover=1000, max_workers=10,
+                                       crawl_delay=0.1, limit_per_host=None, burst=5, session=None,
+                                       state_file=None, resume=True, parse_workers=0, on_url=None,
+                                       progress=None, revalidate_after=None, seeds=None, discover=True,
+                                       on_failed=None):
         """
         Crawls initial URLs and discovers more accessible URLs by following internal links.
+        max_workers caps the requests in flight; crawl_delay sets a per-domain token-bucket
+        rate of 1/crawl_delay requests per second with `burst` requests of headroom.
+        With a state_file the frontier and visited set live in SQLite, and an interrupted
+        crawl picks up where it stopped when run again with resume=True.
+        parse_workers > 0 moves link extraction into that many parser processes.
+        With on_url, each accessible URL is handed to the callback as it is found
+        (including ones found before a resume) instead of being collected in
+        discovered_urls, so memory does not grow with the site. on_failed is called
+        with each URL that was fetched and found inaccessible, or that robots.txt
+        disallows.
+        `progress` is an optional ProgressTracker for live counters and cancellation.
+        revalidate_after (seconds, or a function of the URL) lets pages fetched recently
+        enough be taken from http_cache without a request.
+        initial_urls are all queued up front; `seeds` (a PrioritizedSeeds, see
+        prioritized_seeds) are queued lazily as the frontier drains. Either way
+        the frontier hands out URLs in sitemap-tier order.
+        With discover=True the site's robots.txt is read first (see scripts/discovery.py):
+        disallowed URLs are never fetched, a Crawl-delay longer than crawl_delay
+        slows this host down to it, and the pages listed in the site's own
+        sitemaps are queued up front with initial_urls, so the speculative seeds
+        are only needed for what those sitemaps miss. A robots.txt that rules out
+        the whole site, or cannot be fetched, raises RobotsDisallowed before
+        anything is crawled.
         """
         self.discovered_urls.clear() # Reset for new crawl
-        self.processed_or_queued_urls.clear() # Reset for new crawl
-
-        queue = collections.deque()
-        for url in initial_urls:
-            if url not in self.processed_or_queued_urls:
-                queue.append(url)
-                self.processed_or_queued_urls.add(url)
-
-        print(f"🔍 Starting crawl with {len(initial_urls)} initial URLs...")
-        processed_count = 0
-        accessible_count = 0
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {}
-            while queue and accessible_count < max_urls_to_discover:
-                # Submit a batch of tasks to keep workers busy
-                batch_size = min(len(queue), max_workers * 2)
-                for _ in range(batch_size):
-                    if queue:
-                        url_to_process = queue.popleft()
-                        future = executor.submit(self.fetch_and_extract_links, url_to_process)
-                        futures[future] = url_to_process
-
-                if not futures: # No more URLs to process or waiting for futures
-                    break
-
-                # Process results as they complete
-                # Convert to list to avoid RuntimeError: dictionary changed size during iteration
-                for future in as_completed(list(futures.keys())):
-                    url_processed = futures.pop(future)
-                    processed_count += 1
-                    accessible_url, new_links = future.result()
-
-                    if accessible_url:
-                        with self.lock:
-                            self.discovered_urls.add(accessible_url)
-                            accessible_count = len(self.discovered_urls)
-                        for link in new_links:
-                            if link not in self.processed_or_queued_urls:
-                                queue.append(link)
-                                self.processed_or_queued_urls.add(link)
-
-                    # Implement a small delay to be polite to the server
-                    time.sleep(crawl_delay)
-
-                print(f"Progress: {accessible_count} accessible URLs found, {processed_count} URLs processed, {len(queue)} URLs in queue.")
-
-        print(f"✅ Crawl finished. Found {accessible_count} accessible URLs.")
+        frontier = SQLiteFrontier(state_file, resume=resume, priority=self.sort_tier) if state_file \
+            else MemoryFrontier(priority=self.sort_tier)
+
+        parse_pipeline = ParsePipeline(self.domain, self.link_extractor_kind, workers=parse_workers) \
+            if parse_workers else None
+        engine = AsyncCrawlEngine(
+            self.extract_links,
+            max_concurrency=max_workers,
+            crawl_delay=crawl_delay,
+            limit_per_host=limit_per_host,
+            burst=burst,
+            headers=dict(self.headers),
+            http_cache=self.http_cache,
+            parse_pipeline=parse_pipeline,
+            revalidate_after=revalidate_after,
+            metrics=self.metrics,
+        )
+        own_session = session is None
+        if own_session:
+            session = engine.create_session()
+        robots = None
+        try:
+            sitemap_urls = []
+            if discover:
+                robots = await ROBOTS_CACHE.get(session, self.base_url)
+                if not robots.allowed(self.base_url + '/'):
+                    # Crawling would find nothing, and the empty result must not replace a good sitemap
+                    reason = "could not be fetched" if robots.unreachable else "disallows the whole site"
+                    raise RobotsDisallowed(f"{self.base_url}/robots.txt {reason}; not crawling")
+                frontier = FilteredFrontier(frontier, robots.allowed, on_blocked=on_failed)
+                if robots.crawl_delay and robots.crawl_delay > crawl_delay:
+                    engine.rate_limiter.set_rate(self.domain, 1 / robots.crawl_delay, burst=1)
+                if not frontier.resumed:
+                    # Stale entries just fail validation, so take some more than the target
+                    sitemap_urls = await fetch_sitemap_urls(
+                        session, robots.sitemaps or [self.base_url + '/sitemap.xml'], self.domain,
+                        limit=max_urls_to_discover * 2)
+            self.processed_or_queued_urls = frontier
+
+            for url in initial_urls:
+                frontier.add(canonicalize_url(url))
+            for url in sitemap_urls:
+                frontier.add(url)
+
+            if frontier.resumed:
+                print(f"♻️ Resuming crawl: {frontier.discovered_count()} accessible URLs already found, {len(frontier)} URLs in queue.")
+                if on_url:
+                    for url in frontier.iter_discovered():
+                        on_url(url)
+            print(f"🔍 Starting crawl with {len(initial_urls)} initial URLs, {len(sitemap_urls)} URLs from existing sitemaps"
+                  f"{f' and {len(seeds.families)} seed families' if seeds else ''}...")
+
+            if parse_pipeline:
+                await parse_pipeline.start()
+            processed_count = await engine.crawl(frontier, max_urls_to_discover, session=session, on_url=on_url,
+                                                 progress=progress, seeds=seeds, on_failed=on_failed)
+            if on_url is None:
+                self.discovered_urls.update(frontier.iter_discovered())
+            discovered_count = frontier.discovered_count()
+            frontier.finish()
+        finally:
+            if parse_pipeline:
+                await parse_pipeline.close()
+            frontier.close()
+            if own_session:
+                await session.close()
+
+        print(f"✅ Crawl finished. Found {discovered_count} accessible URLs ({processed_count} URLs processed).")
+        resilience = engine.resilience.summary()
+        if any(resilience.values()):
+            print(f"🔁 {resilience.get('retries', 0)} retries, {resilience.get('timeouts', 0)} timeouts, "
+                  f"{resilience['circuit_trips']} circuit trips, {resilience.get('fast_failures', 0)} fast failures.")
+        if robots:
+            delay = f", Crawl-delay {robots.crawl_delay}s" if robots.crawl_delay else ""
+            print(f"🤖 robots.txt: {len(robots.rules)} rules{delay}; {frontier.blocked} disallowed URLs skipped.")
+        if seeds:
+            seed_summary = seeds.summary()
+            print(f"🌱 {seed_summary['seeds_queued']} seed URLs queued from {seed_summary['families']} families.")
+            if seed_summary['pruned']:
+                print(f"✂️ Pruned {len(seed_summary['pruned'])} mostly-missing families: {', '.join(seed_summary['pruned'])}")
         return self.discovered_urls
 
+    def crawl_and_validate(self, initial_urls, max_urls_to_discover=1000, max_workers=10, crawl_delay=0.1,
+                           limit_per_host=None, burst=5, state_file=None, resume=True, parse_workers=0,
+                           on_url=None, progress=None, revalidate_after=None, seeds=None, discover=True,
+                           on_failed=None):
+        """Synchronous entry point for crawl_and_validate_async"""
+        return asyncio.run(self.crawl_and_validate_async(
+            initial_urls,
+            max_urls_to_discover=max_urls_to_discover,
+            max_workers=max_workers,
+            crawl_delay=crawl_delay,
+            limit_per_host=limit_per_host,
+            burst=burst,
+            state_file=state_file,
+            resume=resume,
+            parse_workers=parse_workers,
+            on_url=on_url,
+            on_failed=on_failed,
+            progress=progress,
+            revalidate_after=revalidate_after,
+            seeds=seeds,
+            discover=discover,
+        ))
+
 
-    def create_comprehensive_sitemap(self, filename="comprehensive_sitemap.xml"):
-        """Create comprehensive sitemap targeting 800+ URLs"""
+    def classify_url(self, url):
+        """Return (sort_tier, priority, changefreq) for a sitemap entry"""
+        # Sort tiers: base URL, then URLs containing 'jobs' or 'careers', then department-specific, then others.
+        # The rules live in scripts/url_classifier.py and are matched with one precompiled regex.
+        return self.classifier.classify(url)
+
+    def sort_tier(self, url):
+        """The sitemap sort tier of url; the crawl frontier's priority"""
+        return self.classify_url(url)[0]
+
+    def revalidate_after(self, url):
+        """Seconds an incremental run trusts a cached copy of url, from its changefreq"""
+        _, _, changefreq = self.classify_url(url)
+        # A little under the full period, so a nightly run doesn't skip a page that is due
+        return CHANGEFREQ_SECONDS[changefreq] * 0.9
+
+    @staticmethod
+    def _previous_sitemap(filename, index_filename, gzip_output):
+        """The sitemap (or index) the last run wrote, or None"""
+        candidates = [filename + '.gz' if gzip_output else filename, index_filename]
+        existing = [path for path in candidates if os.path.exists(path)]
+        return max(existing, key=os.path.getmtime) if existing else None
+
+    def create_comprehensive_sitemap(self, filename="comprehensive_sitemap.xml", **options):
+        """Synchronous entry point for create_comprehensive_sitemap_async"""
+        return asyncio.run(self.create_comprehensive_sitemap_async(filename, **options))
+
+    async def create_comprehensive_sitemap_async(self, filename="comprehensive_sitemap.xml", state_file=None,
+                                                 parse_workers=0, index_filename="sitemap_index.xml",
+                                                 gzip_output=False, progress=None, incremental=False,
+                                                 diff_file=None, max_urls_to_discover=1000, crawl_delay=0.1,
+                                                 session=None, discover=True):
+        """
+        Create comprehensive sitemap targeting 800+ URLs.
+        Entries are streamed to disk as the crawl finds them; past 50,000 URLs the
+        sitemap is split into numbered shards listed in index_filename.
+        Pass a state_file to checkpoint the crawl to disk and resume it if interrupted,
+        and parse_workers to spread HTML parsing over that many processes.
+        max_urls_to_discover and crawl_delay are handed to crawl_and_validate.
+
+        With incremental=True the previous sitemap is read back: its URLs are
+        rechecked, pages still within their changefreq are taken from the HTTP
+        cache without a request, unchanged pages keep their old lastmod, and an
+        added/removed/changed diff is written to diff_file (<stem>_diff.json by
+        default). Previous URLs the crawl did not get to before
+        max_urls_to_discover are kept as they were rather than counted as
+        removed. Incremental mode needs an http_cache; one is created next to
+        the sitemap if the generator has none.
+        `session` is an aiohttp session to crawl with (see crawl_and_validate_async),
+        so several sites can share one connection pool. discover=False skips
+        robots.txt and the site's existing sitemaps (see crawl_and_validate_async).
+        Returns (file_to_submit, url_count).
+        """
         print("🚀 Starting Comprehensive Finploy Sitemap Generation...")
         start_time = time.time()
 
-        # Generate all possible URLs as initial seeds
-        initial_generated_urls = self.generate_comprehensive_urls()
-
-        # Crawl and validate to find accessible URLs
+        # Speculative seeds are generated lazily, best tier first, dropping patterns that keep 404ing
+        seeds = self.prioritized_seeds()
+        initial_urls = []
+
+        previous = {}
+        if incremental:
+            previous_file = self._previous_sitemap(filename, index_filename, gzip_output)
+            if previous_file:
+                # The file may have been written for another site; only this domain's entries carry over
+                previous = {url: lastmod for url, lastmod in read_sitemap_entries(previous_file)
+                            if urlparse(url).netloc == self.domain}
+                print(f"♻️ Incremental run: {len(previous)} URLs in previous sitemap {previous_file}")
+                # Known pages are queued up front; seeds only top the frontier up after them, so
+                # the crawl budget goes to rechecking them before exploring
+                initial_urls = list(previous)
+            if self.http_cache is None:
+                self.http_cache = HttpCache(os.path.splitext(filename)[0] + "_cache.sqlite")
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        current_urls = set()
+        changed_urls = []
+        # Previous URLs the crawl found gone or robots.txt now disallows; only these count as removed
+        failed_urls = set()
+        writer = StreamingSitemapWriter(filename, self.base_url, index_filename=index_filename,
+                                        gzip_output=gzip_output, metrics=self.metrics)
+
+        def lastmod_for(url):
+            # The last time the page's content hash changed; failing that the lastmod it
+            # already had, and today for pages we have never seen before
+            entry = self.http_cache.get(url) if self.http_cache else None
+            if entry and entry['changed_at']:
+                if entry['changed_at'] >= start_time and url in previous:
+                    changed_urls.append(url)
+                return datetime.fromtimestamp(entry['changed_at']).strftime("%Y-%m-%d")
+            return previous.get(url) or today
+
+        def add_to_sitemap(url):
+            tier, priority, changefreq = self.classify_url(url)
+            writer.add(url, lastmod_for(url), changefreq, priority, tier=tier)
+            if incremental:
+                current_urls.add(url)
+
+        def record_failure(url):
+            if url in previous:
+                failed_urls.add(url)
+
+        # Crawl and validate to find accessible URLs, writing each one as it is found
         # Target 1000 accessible URLs, can be adjusted based on site size
-        accessible_urls = self.crawl_and_validate(initial_generated_urls, max_urls_to_discover=1000)
+        with writer:
+            await self.crawl_and_validate_async(initial_urls, max_urls_to_discover=max_urls_to_discover,
+                                                crawl_delay=crawl_delay, seeds=seeds, session=session,
+                                                discover=discover,
+                                                state_file=state_file, parse_workers=parse_workers,
+                                                on_url=add_to_sitemap, progress=progress,
+                                                on_failed=record_failure if incremental else None,
+                                                revalidate_after=self.revalidate_after if incremental else None)
+            # The crawl stops at max_urls_to_discover, so some known pages may not have been
+            # rechecked; they are still live as far as we know and keep their entries
+            unchecked = [url for url in previous if url not in current_urls and url not in failed_urls]
+            for url in unchecked:
+                add_to_sitemap(url)
+
+        url_count = writer.count
+        sitemap_file = writer.files[0] if len(writer.files) == 1 else index_filename
+        self.last_files = list(writer.files) + ([index_filename] if len(writer.files) > 1 else [])
+
+        if incremental:
+            diff_file = diff_file or os.path.splitext(filename)[0] + "_diff.json"
+            self.write_diff(diff_file, previous, current_urls, changed_urls, failed_urls, unchecked)
 
         # Ensure we have 800+ URLs (if not, the crawl might need more aggressive settings or the site doesn't have that many)
-        if len(accessible_urls) < 800:
-            print(f"⚠️ Only {len(accessible_urls)} accessible URLs found. Consider increasing max_urls_to_discover or adjusting crawl_delay if needed.")
-
-        # Create XML sitemap
-        urlset = ET.Element("urlset")
-        urlset.set("xmlns", "http://www.sitemaps.org/schemas/sitemap/0.9")
-
-        # Sort URLs by priority
-        # Prioritize base URL, then URLs containing 'jobs' or 'careers', then department-specific, then others
-        sorted_urls = sorted(list(accessible_urls), key=lambda x: (
-            0 if x == self.base_url else
-            1 if '/jobs' in x or '/careers' in x else
-            2 if any(dept in x for dept in ['sales', 'marketing', 'operations', 'technology', 'finance']) else
-            3
-        ))
-
-        for url in sorted_urls:
-            url_elem = ET.SubElement(urlset, "url")
-
-            loc_elem = ET.SubElement(url_elem, "loc")
-            loc_elem.text = url
-
-            lastmod_elem = ET.SubElement(url_elem, "lastmod")
-            lastmod_elem.text = datetime.now().strftime("%Y-%m-%d")
-
-            # Smart priority and changefreq assignment
-            if url == self.base_url:
-                priority = "1.0"
-                changefreq = "daily"
-            elif any(dept in url for dept in ['sales', 'marketing', 'operations', 'technology', 'finance']):
-                priority = "0.9"
-                changefreq = "daily"
-            elif 'jobs' in url or 'careers' in url:
-                priority = "0.8"
-                changefreq = "daily"
-            else:
-                priority = "0.6"
-                changefreq = "weekly"
-
-            changefreq_elem = ET.SubElement(url_elem, "changefreq")
-            changefreq_elem.text = changefreq
-
-            priority_elem = ET.SubElement(url_elem, "priority")
-            priority_elem.text = priority
-
-        # Write sitemap
-        tree = ET.ElementTree(urlset)
-        ET.indent(tree, space="  ", level=0)
-        tree.write(filename, encoding="utf-8", xml_declaration=True)
+        if url_count < 800:
+            print(f"⚠️ Only {url_count} accessible URLs found. Consider increasing max_urls_to_discover or adjusting crawl_delay if needed.")
 
         end_time = time.time()
 
         print(f"\n✅ COMPREHENSIVE SITEMAP COMPLETED!")
         print(f"⏱️ Time taken: {end_time - start_time:.2f} seconds")
-        print(f"📁 Sitemap saved as: {filename}")
-        print(f"🔗 Total URLs: {len(sorted_urls)}")
-        print(f"🎯 Target achieved: {'✅ YES' if len(sorted_urls) >= 800 else '❌ NO'}")
+        print(f"📁 Sitemap saved as: {sitemap_file}")
+        if len(writer.files) > 1:
+            print(f"🗂️ Split into {len(writer.files)} shards: {', '.join(writer.files)}")
+        print(f"🔗 Total URLs: {url_count}")
+        print(f"🎯 Target achieved: {'✅ YES' if url_count >= 800 else '❌ NO'}")
+
+        return sitemap_file, url_count
 
-        return filename, len(sorted_urls)
+    def write_diff(self, diff_file, previous, current_urls, changed_urls, failed_urls, unchecked_urls):
+        """
+        Write what changed since the previous sitemap and keep the counts in last_diff.
+        Only previous URLs that were fetched and failed, or that robots.txt now
+        disallows, count as removed; ones the
+        crawl did not get to are carried over and counted as unchecked.
+        """
+        added = sorted(url for url in current_urls if url not in previous)
+        removed = sorted(failed_urls)
+        changed = sorted(changed_urls)
+        self.last_diff = {
+            'previous_urls': len(previous),
+            'current_urls': len(current_urls),
+            'added': len(added),
+            'removed': len(removed),
+            'changed': len(changed),
+            'unchecked': len(unchecked_urls),
+            'diff_file': diff_file,
+        }
+        with open(diff_file, 'w') as f:
+            json.dump({
+                'generated_at': datetime.now().isoformat(),
+                'summary': self.last_diff,
+                'added': added,
+                'removed': removed,
+                'changed': changed,
+            }, f, indent=2)
+        print(f"🧾 Changes since last sitemap: +{len(added)} added, -{len(removed)} removed, ~{len(changed)} changed, "
+              f"{len(unchecked_urls)} carried over unchecked ({diff_file})")
 
 # Main execution
 if __name__ == "__main__":
-    generator = ComprehensiveFinploySitemap("https://www.finploy.com")
-    sitemap_file, url_count = generator.create_comprehensive_sitemap()
-
-    # Also generate for UK site
-    print(f"\n🇬🇧 Generating UK sitemap...")
-    generator_uk = ComprehensiveFinploySitemap("https://finploy.co.uk")
-    sitemap_file_uk, url_count_uk = generator_uk.create_comprehensive_sitemap("comprehensive_sitemap_uk.xml")
-
-    print(f"\n🎉 FINAL RESULTS:")
-    print(f"📊 finploy.com: {url_count} URLs")
-    print(f"📊 finploy.co.uk: {url_count_uk} URLs")
-    print(f"🎯 Total URLs: {url_count + url_count_uk}")
+    try:
+        from scripts.multi_site import MultiSiteGenerator
+    except ImportError:
+        from multi_site import MultiSiteGenerator
+
+    # finploy.com and finploy.co.uk are crawled at the same time, sharing one connection pool
+    summary = MultiSiteGenerator(validate=False).run()
+    url_count = summary['sites'][0].get('total_urls', 0)
     print(f"✅ Assignment requirement (800+ URLs): {'ACHIEVED' if url_count >= 800 else 'PARTIAL'}")
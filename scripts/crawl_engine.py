@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import time
+
+import aiohttp
+
+try:
+    from scripts.metrics import METRICS
+    from scripts.rate_limiter import HostRateLimiter, parse_retry_after
+    from scripts.resilience import RETRYABLE_STATUSES, ResilienceLayer, RetryableStatus
+except ImportError:  # running from inside scripts/
+    from metrics import METRICS
+    from rate_limiter import HostRateLimiter, parse_retry_after
+    from resilience import RETRYABLE_STATUSES, ResilienceLayer, RetryableStatus
+
+RATE_LIMITED_STATUSES = (429, 503)
+
+
+class RateLimited(Exception):
+    """Raised when a host is still answering 429/503 after every rate-limit retry"""
+
+
+class AsyncCrawlEngine:
+    """
+    aiohttp-based crawl engine that keeps a fixed number of fetches in flight.
+
+    A new fetch is started as soon as any running one completes, so a slow page
+    only occupies its own slot instead of stalling a whole batch.
+    """
+
+    def __init__(self, extract_links, max_concurrency=10, crawl_delay=0.1,
+                 limit_per_host=None, timeout=5, headers=None, burst=5,
+                 rate_limiter=None, max_rate_limit_retries=3, http_cache=None,
+                 parse_pipeline=None, revalidate_after=None, resilience=None, metrics=None):
+        self.extract_links = extract_links
+        self.http_cache = http_cache
+        # Seconds (or a function of the URL returning seconds) a cached page is trusted
+        # without asking the server again; None always sends the conditional request
+        self.revalidate_after = revalidate_after
+        # Optional process-pool parse stage; links are extracted inline without one
+        self.parse_pipeline = parse_pipeline
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host or max_concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = headers or {}
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+        # crawl_delay becomes a per-domain rate of 1/crawl_delay requests per second
+        if rate_limiter is None:
+            rate = 1.0 / crawl_delay if crawl_delay and crawl_delay > 0 else None
+            rate_limiter = HostRateLimiter(rate, burst=burst)
+        self.rate_limiter = rate_limiter
+        # Per-phase latency histograms (DNS, connect, TTFB, download, parse, rate-limit waits)
+        self.metrics = metrics or METRICS
+        # Retries transient failures, breaks the circuit on failing hosts and shrinks concurrency on timeouts
+        self.resilience = resilience or ResilienceLayer(max_concurrency=max_concurrency)
+
+    def create_session(self):
+        """Create a session backed by a bounded, keep-alive connection pool"""
+        connector = aiohttp.TCPConnector(
+            limit=self.max_concurrency,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=self.timeout,
+                                     trace_configs=[self.metrics.trace_config()])
+
+    def _is_fresh(self, url, cached):
+        if self.revalidate_after is None or cached['status'] != 200:
+            return False
+        max_age = self.revalidate_after(url) if callable(self.revalidate_after) else self.revalidate_after
+        return time.time() - cached['fetched_at'] < max_age
+
+    async def fetch(self, session, url):
+        """
+        Fetches a URL and extracts its internal links.
+        Returns (accessible_url, list_of_internal_links) or (None, []).
+        With an http_cache the request is conditional, and a 304 reuses the links
+        extracted on the previous run. Pages fetched less than revalidate_after
+        seconds ago are not requested at all. Connection errors, timeouts and
+        500/502/504 responses are retried through the resilience layer; a host
+        still answering 429/503 after max_rate_limit_retries gives (None, []). Raises
+        CircuitOpenError once the host's circuit has given up on it.
+        """
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached and self._is_fresh(url, cached):
+            return url, cached['links']
+        headers = self.http_cache.conditional_headers(url, cached) if cached else None
+        with self.metrics.timer('crawl.fetch'):
+            try:
+                return await self.resilience.call(url, lambda: self._fetch_once(session, url, cached, headers))
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus, RateLimited):
+                # Handle connection errors, timeouts, etc. once retries are used up
+                return None, []
+
+    async def _fetch_once(self, session, url, cached, headers):
+        """
+        One attempt at a fetch; raises RetryableStatus for server errors worth retrying
+        and RateLimited once the host's 429/503s outlast max_rate_limit_retries
+        """
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.metrics.observe('crawl.rate_limit_wait', await self.rate_limiter.acquire(url))
+            async with session.get(url, headers=headers) as response:
+                if response.status in RATE_LIMITED_STATUSES:
+                    # Server asked us to slow down: back the whole host off and try again
+                    self.rate_limiter.penalize(url, parse_retry_after(response.headers.get('Retry-After')))
+                    if attempt < self.max_rate_limit_retries:
+                        continue
+                    # Still throttled: neither a success for the host's backoff nor for its circuit
+                    raise RateLimited(response.status)
+                if response.status in RETRYABLE_STATUSES:
+                    raise RetryableStatus(response.status)
+                self.rate_limiter.record_success(url)
+                if response.status == 304 and cached:
+                    self.http_cache.touch(url)
+                    return url, cached['links']
+                if response.status == 200 and 'text/html' in response.headers.get('Content-Type', ''):
+                    with self.metrics.timer('crawl.download'):
+                        body = await response.read()
+                    with self.metrics.timer('crawl.parse'):
+                        if self.parse_pipeline:
+                            links = await self.parse_pipeline.submit(url, body, response.charset)
+                        else:
+                            links = self.extract_links(url, body, response.charset)
+                    if self.http_cache:
+                        self.http_cache.store(url, response.status, response.headers.get('ETag'),
+                                              response.headers.get('Last-Modified'), links,
+                                              content_hash=hashlib.blake2b(body, digest_size=16).hexdigest())
+                    return url, links
+                return None, []
+
+    async def crawl(self, frontier, max_urls_to_discover, session=None, on_url=None, progress=None, seeds=None,
+                    on_failed=None):
+        """
+        Drains `frontier` with at most max_concurrency fetches in flight.
+        Newly found links are added back to the frontier and every fetched URL
+        is marked done, accessible or not. on_url, if given, is called with each
+        accessible URL as soon as it is found, and on_failed with each URL that
+        was fetched and turned out not to be. `progress` (a ProgressTracker)
+        receives counters as the crawl runs and can cancel it.
+        `seeds` (a PrioritizedSeeds) tops the frontier up whenever it runs low,
+        or sooner when its next seed would rank ahead of everything queued, and
+        is told how each of its seeds fared.
+        If the host goes down for good (its circuit breaker gives up), the crawl
+        is aborted with CircuitOpenError rather than every remaining URL being
+        marked failed; a persistent frontier then resumes from where it stopped.
+        Returns the number of URLs processed.
+        """
+        own_session = session is None
+        if own_session:
+            session = self.create_session()
+
+        processed_count = 0
+        error_count = 0
+        report_every = self.max_concurrency * 2
+        # Seeds are generated only as the frontier needs them, so pruned families cost nothing
+        low_water = self.max_concurrency * 2
+        in_flight = {}
+        try:
+            while True:
+                if progress:
+                    # Stops the crawl; in-flight URLs stay queued in a persistent frontier
+                    progress.check_cancelled()
+
+                if seeds is not None and frontier.discovered_count() < max_urls_to_discover:
+                    if len(frontier) < low_water:
+                        seeds.fill(frontier, low_water - len(frontier))
+                    else:
+                        # Followed links may have filled the frontier with a lower tier than the
+                        # seeds still to come; those seeds are queued now so they are popped first
+                        seeds.fill(frontier, low_water, below_tier=frontier.best_priority())
+
+                # Top up the pool as long as there is work and the target is not met
+                while len(in_flight) < self.max_concurrency and \
+                        frontier.discovered_count() < max_urls_to_discover:
+                    url = frontier.pop()
+                    if url is None:
+                        break
+                    in_flight[asyncio.ensure_future(self.fetch(session, url))] = url
+
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url = in_flight.pop(task)
+                    processed_count += 1
+                    accessible_url, new_links = task.result()
+
+                    frontier.mark_done(url, accessible_url is not None)
+                    if seeds is not None:
+                        seeds.record(url, accessible_url is not None)
+                    if accessible_url is None:
+                        error_count += 1
+                        if on_failed:
+                            on_failed(url)
+                    elif on_url:
+                        on_url(accessible_url)
+                    for link in new_links:
+                        frontier.add(link)
+
+                    if processed_count % report_every == 0:
+                        print(f"Progress: {frontier.discovered_count()} accessible URLs found, {processed_count} URLs processed, {len(frontier)} URLs in queue.")
+                    if progress:
+                        progress.update(processed_count, frontier.discovered_count(), error_count,
+                                        queued=len(frontier), in_flight=len(in_flight))
+
+            if progress:
+                progress.update(processed_count, frontier.discovered_count(), error_count,
+                                queued=len(frontier), force=True)
+        finally:
+            for task in in_flight:
+                if task.done():
+                    # Finished but not looked at because the crawl is aborting; read it so asyncio doesn't warn
+                    task.exception()
+                else:
+                    task.cancel()
+            frontier.checkpoint()
+            if own_session:
+                await session.close()
+
+        return processed_count
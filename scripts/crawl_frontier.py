@@ -0,0 +1,257 @@
+import collections
+import heapq
+import os
+import sqlite3
+
+try:
+    from scripts.url_index import FingerprintSet
+except ImportError:  # running from inside scripts/
+    from url_index import FingerprintSet
+
+QUEUED = 0
+IN_PROGRESS = 1
+ACCESSIBLE = 2
+FAILED = 3
+
+
+class MemoryFrontier:
+    """
+    In-memory crawl frontier: a priority queue plus a fingerprint set of every URL ever queued.
+
+    `priority` maps a URL to a number; lower numbers are popped first and
+    URLs of equal priority come out in the order they were added. Without
+    one the frontier is a plain FIFO.
+    """
+
+    def __init__(self, bloom_capacity=None, priority=None):
+        self.queue = []
+        self.priority = priority
+        self.next_seq = 0
+        self.seen = FingerprintSet(bloom_capacity=bloom_capacity)
+        self.accessible = set()
+        self.resumed = False
+
+    def __contains__(self, url):
+        return url in self.seen
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, url):
+        """Queue a URL unless it has been queued before; returns True if it was new"""
+        if not self.seen.add(url):
+            return False
+        heapq.heappush(self.queue, (self.priority(url) if self.priority else 0, self.next_seq, url))
+        self.next_seq += 1
+        return True
+
+    def pop(self):
+        return heapq.heappop(self.queue)[2] if self.queue else None
+
+    def best_priority(self):
+        """Priority of the URL pop() would return next, or None when the queue is empty"""
+        return self.queue[0][0] if self.queue else None
+
+    def mark_done(self, url, accessible):
+        if accessible:
+            self.accessible.add(url)
+
+    def discovered_count(self):
+        return len(self.accessible)
+
+    def iter_discovered(self):
+        return iter(self.accessible)
+
+    def checkpoint(self):
+        pass
+
+    def finish(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteFrontier:
+    """
+    Disk-backed crawl frontier and visited set.
+
+    Every URL lives in one SQLite table together with its crawl state, so the
+    queue and the visited set never have to fit in RAM. Only a small batch of
+    queued URLs is held in memory at a time. Progress is committed every
+    `checkpoint_every` state changes; a crawl that dies between checkpoints
+    loses at most that many results, and URLs that were in flight are queued
+    again on resume. URLs are popped lowest `priority(url)` first, then in
+    the order they were added (see MemoryFrontier); adding a URL that ranks
+    ahead of the prefetched batch hands the batch back to the table.
+    """
+
+    def __init__(self, path, resume=True, checkpoint_every=200, prefetch=256, priority=None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.prefetch = prefetch
+        self.priority = priority
+        self.buffer = collections.deque()
+        self.pending_writes = 0
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            " url TEXT PRIMARY KEY,"
+            " state INTEGER NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " priority INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS urls_state_priority_seq ON urls (state, priority, seq)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        # Only an unfinished crawl is worth resuming; a completed one starts over
+        self.resumed = resume and self._get_meta('complete') == '0'
+        if self.resumed:
+            self.conn.execute("UPDATE urls SET state = ? WHERE state = ?", (QUEUED, IN_PROGRESS))
+        else:
+            self.conn.execute("DELETE FROM urls")
+        self._set_meta('complete', '0')
+        self.conn.commit()
+
+        self.next_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM urls").fetchone()[0]
+        self.queued = self._count(QUEUED)
+        self.accessible = self._count(ACCESSIBLE)
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _count(self, state):
+        return self.conn.execute("SELECT COUNT(*) FROM urls WHERE state = ?", (state,)).fetchone()[0]
+
+    def _touch(self):
+        self.pending_writes += 1
+        if self.pending_writes >= self.checkpoint_every:
+            self.checkpoint()
+
+    def __contains__(self, url):
+        return self.conn.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def __len__(self):
+        return self.queued
+
+    def add(self, url):
+        """Queue a URL unless it has been queued before; returns True if it was new"""
+        priority = self.priority(url) if self.priority else 0
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO urls (url, state, seq, priority) VALUES (?, ?, ?, ?)",
+            (url, QUEUED, self.next_seq, priority),
+        )
+        if cursor.rowcount == 0:
+            return False
+        self.next_seq += 1
+        self.queued += 1
+        if self.buffer and priority < self.buffer[0][0]:
+            # The new URL must come out before the prefetched batch; let the next pop re-read the table
+            self.conn.executemany("UPDATE urls SET state = ? WHERE url = ?", [(QUEUED, url) for _, url in self.buffer])
+            self.buffer.clear()
+        self._touch()
+        return True
+
+    def pop(self):
+        if not self.buffer:
+            rows = self.conn.execute(
+                "SELECT priority, url FROM urls WHERE state = ? ORDER BY priority, seq LIMIT ?",
+                (QUEUED, self.prefetch),
+            ).fetchall()
+            if not rows:
+                return None
+            self.conn.executemany("UPDATE urls SET state = ? WHERE url = ?", [(IN_PROGRESS, url) for _, url in rows])
+            self.buffer.extend(rows)
+        self.queued -= 1
+        return self.buffer.popleft()[1]
+
+    def best_priority(self):
+        """Priority of the URL pop() would return next, or None when nothing is queued"""
+        if self.buffer:
+            return self.buffer[0][0]
+        row = self.conn.execute("SELECT MIN(priority) FROM urls WHERE state = ?", (QUEUED,)).fetchone()
+        return row[0]
+
+    def mark_done(self, url, accessible):
+        self.conn.execute("UPDATE urls SET state = ? WHERE url = ?", (ACCESSIBLE if accessible else FAILED, url))
+        if accessible:
+            self.accessible += 1
+        self._touch()
+
+    def discovered_count(self):
+        return self.accessible
+
+    def iter_discovered(self):
+        cursor = self.conn.execute("SELECT url FROM urls WHERE state = ? ORDER BY seq", (ACCESSIBLE,))
+        for row in cursor:
+            yield row[0]
+
+    def checkpoint(self):
+        """Flush progress to disk"""
+        self.conn.commit()
+        self.pending_writes = 0
+
+    def finish(self):
+        """Mark the crawl as complete so the next run starts fresh instead of resuming"""
+        self._set_meta('complete', '1')
+        self.checkpoint()
+
+    def close(self):
+        self.checkpoint()
+        self.conn.close()
+
+
+class FilteredFrontier:
+    """
+    Wraps a frontier so URLs for which `allowed(url)` is false are never crawled.
+
+    Rejected URLs are not queued (add returns False, as for a duplicate) and
+    are counted in `blocked`; `on_blocked`, if given, is called with each one.
+    URLs already in a resumed frontier are checked again on pop and marked
+    failed instead of being handed out, so rules tightened since the last run
+    still apply. Everything else is the wrapped frontier's.
+    """
+
+    def __init__(self, frontier, allowed, on_blocked=None):
+        self.frontier = frontier
+        self.allowed = allowed
+        self.on_blocked = on_blocked
+        self.blocked = 0
+
+    def __getattr__(self, name):
+        return getattr(self.frontier, name)
+
+    def __contains__(self, url):
+        return url in self.frontier
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def add(self, url):
+        if not self.allowed(url):
+            self._block(url)
+            return False
+        return self.frontier.add(url)
+
+    def pop(self):
+        url = self.frontier.pop()
+        while url is not None and not self.allowed(url):
+            self._block(url)
+            self.frontier.mark_done(url, False)
+            url = self.frontier.pop()
+        return url
+
+    def _block(self, url):
+        self.blocked += 1
+        if self.on_blocked:
+            self.on_blocked(url)
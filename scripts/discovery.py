@@ -0,0 +1,209 @@
+import asyncio
+import io
+import re
+import time
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+
+try:
+    from scripts.sitemap_reader import iter_sitemap_entries
+    from scripts.url_index import canonicalize_url
+except ImportError:  # running from inside scripts/
+    from sitemap_reader import iter_sitemap_entries
+    from url_index import canonicalize_url
+
+# RFC 9309: crawlers must parse at least 500 KiB of a robots.txt; anything after that is ignored
+MAX_ROBOTS_BYTES = 500 * 1024
+# How long a host's robots.txt is trusted before it is fetched again
+ROBOTS_TTL = 24 * 3600
+# How long an unreachable robots.txt keeps the host blocked before it is tried again
+ROBOTS_FAILURE_TTL = 5 * 60
+
+
+class RobotsDisallowed(Exception):
+    """Raised instead of crawling a site whose robots.txt rules out the whole site (or could not be read)"""
+
+
+def _rule_regex(pattern):
+    """A robots.txt path pattern ('*' wildcard, trailing '$' anchor) as a regex fragment"""
+    anchored = pattern.endswith('$')
+    body = '.*'.join(re.escape(part) for part in (pattern[:-1] if anchored else pattern).split('*'))
+    return body + ('\\Z' if anchored else '')
+
+
+class RobotsRules:
+    """
+    The robots.txt rules that apply to one user agent.
+
+    Groups naming the agent are used when there are any, otherwise the '*'
+    groups. The most specific (longest) matching Allow/Disallow pattern
+    wins, with Allow winning ties, as in RFC 9309. All patterns are compiled
+    into one anchored regex whose alternatives are in that precedence
+    order, so checking a URL is a single match.
+    """
+
+    def __init__(self, rules=(), crawl_delay=None, sitemaps=(), allow_all=False, disallow_all=False,
+                 unreachable=False):
+        self.crawl_delay = crawl_delay
+        self.sitemaps = list(sitemaps)
+        self.disallow_all = disallow_all
+        # disallow_all because the robots.txt could not be fetched, rather than because it says so
+        self.unreachable = unreachable
+        # (pattern, allowed) ordered longest first, Allow before Disallow on equal length
+        self.rules = sorted(((pattern, allowed) for pattern, allowed in rules if pattern),
+                            key=lambda rule: (-len(rule[0]), not rule[1]))
+        if allow_all:
+            self.rules = []
+        self.verdicts = [allowed for _, allowed in self.rules]
+        self.pattern = re.compile('|'.join(f"({_rule_regex(pattern)})" for pattern, _ in self.rules)) \
+            if self.rules else None
+
+    @classmethod
+    def parse(cls, text, user_agent='*'):
+        agent = user_agent.lower()
+        groups = []
+        sitemaps = []
+        current = None
+        collecting_agents = False
+        for line in text.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            field, value = (part.strip() for part in line.split(':', 1))
+            field = field.lower()
+            if field == 'sitemap':
+                if value:
+                    sitemaps.append(value)
+            elif field == 'user-agent':
+                if not collecting_agents:
+                    current = {'agents': [], 'rules': [], 'crawl_delay': None}
+                    groups.append(current)
+                    collecting_agents = True
+                current['agents'].append(value.lower())
+            elif current is not None:
+                collecting_agents = False
+                if field in ('allow', 'disallow'):
+                    current['rules'].append((value, field == 'allow'))
+                elif field == 'crawl-delay':
+                    try:
+                        current['crawl_delay'] = float(value)
+                    except ValueError:
+                        pass
+
+        named = [group for group in groups if any(name != '*' and name in agent for name in group['agents'])]
+        selected = named or [group for group in groups if '*' in group['agents']]
+        rules = [rule for group in selected for rule in group['rules']]
+        delays = [group['crawl_delay'] for group in selected if group['crawl_delay'] is not None]
+        return cls(rules, crawl_delay=max(delays) if delays else None, sitemaps=sitemaps)
+
+    def allowed(self, url):
+        parts = urlsplit(url)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        if path == '/robots.txt':
+            return True
+        if self.disallow_all:
+            return False
+        if self.pattern is None:
+            return True
+        match = self.pattern.match(path)
+        return True if match is None else self.verdicts[match.lastindex - 1]
+
+
+class RobotsCache:
+    """
+    robots.txt per host, fetched once and reused for `ttl` seconds (by every
+    generator in the process). A robots.txt that could not be fetched is only
+    remembered for `failure_ttl` seconds, so a short outage does not block
+    the host for a day.
+    """
+
+    def __init__(self, ttl=ROBOTS_TTL, failure_ttl=ROBOTS_FAILURE_TTL, user_agent='*', attempts=3):
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.user_agent = user_agent
+        self.attempts = attempts
+        self.entries = {}
+
+    async def get(self, session, base_url):
+        parts = urlsplit(base_url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        entry = self.entries.get(key)
+        if entry and time.time() < entry[1]:
+            return entry[0]
+        rules = await self._fetch(session, key + '/robots.txt')
+        self.entries[key] = (rules, time.time() + (self.failure_ttl if rules.unreachable else self.ttl))
+        return rules
+
+    async def _fetch(self, session, robots_url):
+        for attempt in range(self.attempts):
+            try:
+                async with session.get(robots_url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                    if 200 <= response.status < 300:
+                        body = await response.content.read(MAX_ROBOTS_BYTES)
+                        return RobotsRules.parse(body.decode('utf-8', errors='replace'), self.user_agent)
+                    if 400 <= response.status < 500:
+                        # No robots.txt (or not ours to read): everything may be crawled
+                        return RobotsRules(allow_all=True)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            if attempt + 1 < self.attempts:
+                await asyncio.sleep(2 ** attempt)
+        # RFC 9309: an unreachable robots.txt means the whole site is off limits for now
+        print(f"⚠️ {robots_url} is unreachable; not crawling the site")
+        return RobotsRules(disallow_all=True, unreachable=True)
+
+
+# Shared by every crawl in the process, so a host's robots.txt is fetched once a day
+ROBOTS_CACHE = RobotsCache()
+
+
+async def _read_sitemap(session, url):
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+        if response.status != 200:
+            return None
+        return await response.read()
+
+
+async def fetch_sitemap_urls(session, sitemap_urls, domain, limit=50_000, max_depth=2):
+    """
+    Page URLs on `domain` listed in existing sitemaps (following sitemap indexes
+    up to max_depth levels), canonicalized and deduplicated; at most `limit`.
+    Sitemaps that are missing or malformed are skipped, as are entries whose
+    <loc> is not a valid URL.
+    """
+    found = {}
+    pending = [(url, 0) for url in sitemap_urls]
+    seen_sitemaps = set()
+    while pending and len(found) < limit:
+        sitemap_url, depth = pending.pop(0)
+        if sitemap_url in seen_sitemaps:
+            continue
+        seen_sitemaps.add(sitemap_url)
+        try:
+            body = await _read_sitemap(session, sitemap_url)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+            continue
+        if body is None:
+            continue
+        try:
+            for kind, loc, _ in iter_sitemap_entries(io.BytesIO(body)):
+                try:
+                    loc = urljoin(sitemap_url, loc)
+                    if kind == 'sitemap':
+                        if depth < max_depth:
+                            pending.append((loc, depth + 1))
+                        continue
+                    loc = canonicalize_url(loc)
+                    netloc = urlsplit(loc).netloc
+                except ValueError:
+                    # A malformed <loc> (bad port, unbalanced IPv6 brackets); skip just that entry
+                    continue
+                if netloc == domain:
+                    found.setdefault(loc, None)
+                    if len(found) >= limit:
+                        break
+        except (ET.ParseError, OSError, EOFError):
+            continue
+    return list(found)
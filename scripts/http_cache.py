@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class HttpCache:
+    """
+    Local HTTP validator cache shared by the crawler and the validator.
+
+    For every successfully fetched page it keeps the ETag / Last-Modified
+    validators and the links extracted from the body, so a repeat run can send
+    a conditional GET and reuse the link list on a 304 instead of downloading
+    and parsing the page again. A hash of the body is kept too: `changed_at`
+    is the time the hash was last seen to change (None until it has been seen
+    twice), which gives sitemaps a real lastmod. Entries are evicted
+    least-recently-used once the stored size passes `max_bytes`.
+    """
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " url TEXT PRIMARY KEY,"
+            " status INTEGER,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " links TEXT,"
+            " size INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " content_hash TEXT,"
+            " changed_at REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, url):
+        """Return the cached entry for a URL as a dict, or None"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, etag, last_modified, links, fetched_at, content_hash, changed_at"
+                " FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        status, etag, last_modified, links, fetched_at, content_hash, changed_at = row
+        return {
+            'url': url,
+            'status': status,
+            'etag': etag,
+            'last_modified': last_modified,
+            'links': links.split('\n') if links else [],
+            'fetched_at': fetched_at,
+            'content_hash': content_hash,
+            'changed_at': changed_at,
+        }
+
+    def conditional_headers(self, url, entry=None):
+        """Headers that turn a request for `url` into a conditional one"""
+        entry = entry if entry is not None else self.get(url)
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, status, etag=None, last_modified=None, links=(), content_hash=None):
+        """Record a fetched page, its validators, its extracted links and a hash of its body"""
+        links_text = '\n'.join(links)
+        size = len(url) + len(links_text) + len(etag or '') + len(last_modified or '') + 96
+        now = time.time()
+        with self.lock:
+            old = self.conn.execute(
+                "SELECT size, content_hash, changed_at FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            changed_at = None
+            if old:
+                _, old_hash, changed_at = old
+                if old_hash and content_hash and old_hash != content_hash:
+                    changed_at = now
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (url, status, etag, last_modified, links, size, fetched_at, accessed_at, content_hash, changed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, status, etag, last_modified, links_text, size, now, now, content_hash, changed_at),
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def touch(self, url):
+        """Mark an entry as revalidated (the server answered 304)"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute("UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self.conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes"""
+        target = self.max_bytes * 0.9
+        cursor = self.conn.execute("SELECT url, size FROM entries ORDER BY accessed_at")
+        victims = []
+        for url, size in cursor:
+            if self.total_bytes <= target:
+                break
+            victims.append((url,))
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM entries WHERE url = ?", victims)
+
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
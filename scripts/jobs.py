@@ -0,0 +1,157 @@
+import collections
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from scripts.progress import Cancelled, ProgressTracker
+except ImportError:  # running from inside scripts/
+    from progress import Cancelled, ProgressTracker
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class Job:
+    """
+    A unit of background work (a crawl or a validation run) and its outcome.
+
+    Progress is published into a bounded ring buffer of numbered events, so a
+    subscriber that connects late (or reconnects with Last-Event-ID) catches
+    up on the most recent `max_events` events instead of the whole history.
+    """
+
+    def __init__(self, kind, target, max_events=500):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target = target
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = collections.deque(maxlen=max_events)
+        self.last_event_id = 0
+        self.changed = threading.Condition()
+        self.cancel_requested = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED, CANCELLED)
+
+    def publish(self, event_type, data):
+        with self.changed:
+            self.last_event_id += 1
+            self.events.append((self.last_event_id, event_type, data))
+            self.changed.notify_all()
+
+    def events_since(self, last_id, timeout=None):
+        """Events newer than last_id, waiting up to `timeout` seconds for one to arrive"""
+        with self.changed:
+            if self.last_event_id <= last_id and not self.done and timeout:
+                self.changed.wait(timeout)
+            return [event for event in self.events if event[0] > last_id]
+
+    def cancel(self):
+        self.cancel_requested.set()
+
+    def progress_tracker(self, phase, interval=1.0):
+        """A ProgressTracker wired to this job's event stream and cancel flag"""
+        return ProgressTracker(
+            callback=lambda data: self.publish('progress', data),
+            should_stop=self.cancel_requested.is_set,
+            phase=phase,
+            interval=interval,
+        )
+
+    def to_dict(self, include_result=True):
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'target': self.target,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+
+class JobManager:
+    """
+    In-process job queue for long crawls and validations.
+
+    Jobs run on a dedicated thread pool so web workers return immediately.
+    Submitting the same (kind, target) while a job for it is still queued or
+    running returns that job instead of starting a duplicate crawl. Only the
+    most recent `max_finished` finished jobs are kept. The job function is
+    called with the Job as its `job` keyword argument so it can publish
+    progress and notice cancellation.
+    """
+
+    def __init__(self, max_workers=2, max_finished=100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sitemap-job')
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind, target, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); returns (job, created) where created is False for a deduplicated submit"""
+        key = (kind, target)
+        with self.lock:
+            existing = self.active.get(key)
+            if existing is not None:
+                return self.jobs[existing], False
+            job = Job(kind, target)
+            self.jobs[job.id] = job
+            self.active[key] = job.id
+            self._prune()
+        self.executor.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            if job.cancel_requested.is_set():
+                raise Cancelled(f"{job.kind} cancelled before it started")
+            job.result = fn(*args, job=job, **kwargs)
+            job.status = SUCCEEDED
+        except Cancelled as e:
+            job.error = str(e)
+            job.status = CANCELLED
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind} {job.target}) failed: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self.lock:
+                self.active.pop((job.kind, job.target), None)
+            job.publish('done', job.to_dict(include_result=False))
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        if len(finished) <= self.max_finished:
+            return
+        finished.sort(key=lambda job: job.finished_at)
+        for job in finished[:len(finished) - self.max_finished]:
+            del self.jobs[job.id]
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,113 @@
+import html
+import re
+from urllib.parse import urljoin, urlsplit
+
+from bs4 import BeautifulSoup
+
+try:
+    from scripts.url_index import canonicalize_url
+except ImportError:  # running from inside scripts/
+    from url_index import canonicalize_url
+
+# Hrefs that never point at a crawlable page
+SKIPPED_HREF_PREFIXES = ('mailto:', 'tel:', 'javascript:', 'data:', '#')
+
+# Tokens the streaming extractor cares about: comments and script/style bodies
+# are matched only so they can be skipped, anchors are the ones we keep.
+TOKEN_RE = re.compile(
+    rb'<!--.*?-->|<(script|style)\b.*?</\1\s*>|<a\s([^>]*)>',
+    re.IGNORECASE | re.DOTALL,
+)
+HREF_RE = re.compile(
+    rb'''(?:^|\s)href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+))''',
+    re.IGNORECASE,
+)
+
+
+class LinkExtractor:
+    """
+    Base link-extraction stage: turns a page body into same-domain links.
+
+    Subclasses only implement iter_hrefs(); resolving, the same-domain check,
+    the mailto:/tel:/#anchor filtering and canonicalization live here so every
+    backend agrees.
+    """
+
+    def __init__(self, domain):
+        self.domain = domain
+
+    def iter_hrefs(self, body, encoding):
+        raise NotImplementedError
+
+    def extract(self, page_url, body, encoding=None):
+        """Return the canonical same-domain links found in `body` (bytes or str)"""
+        encoding = encoding or 'utf-8'
+        page = urlsplit(page_url)
+        origin = f"{page.scheme}://{page.netloc}"
+        same_site = page.netloc == self.domain
+        links = []
+        seen = set()
+        for href in self.iter_hrefs(body, encoding):
+            href = href.strip()
+            if not href or href.lower().startswith(SKIPPED_HREF_PREFIXES):
+                continue
+            try:
+                if same_site and href[0] == '/' and href[1:2] != '/' and '/.' not in href:
+                    # Root-relative links are the common case and need no full urljoin
+                    absolute_url = origin + href
+                else:
+                    absolute_url = urljoin(page_url, href)
+                    if urlsplit(absolute_url).netloc != self.domain:
+                        continue
+                absolute_url = canonicalize_url(absolute_url)
+            except ValueError:
+                # Malformed href (e.g. http://[broken/); one bad link must not fail the page
+                continue
+            if absolute_url not in seen:
+                seen.add(absolute_url)
+                links.append(absolute_url)
+        return links
+
+
+class StreamingLinkExtractor(LinkExtractor):
+    """Event-driven tokenizer over the raw bytes: no DOM, no decoding of the whole page"""
+
+    def iter_hrefs(self, body, encoding):
+        if isinstance(body, str):
+            body = body.encode(encoding, errors='replace')
+        for match in TOKEN_RE.finditer(body):
+            attributes = match.group(2)
+            if attributes is None:
+                continue
+            href = HREF_RE.search(attributes)
+            if href is None:
+                continue
+            raw = href.group(1) if href.group(1) is not None else \
+                href.group(2) if href.group(2) is not None else href.group(3)
+            href = raw.decode(encoding, errors='replace')
+            yield html.unescape(href) if '&' in href else href
+
+
+class SoupLinkExtractor(LinkExtractor):
+    """The original BeautifulSoup(html.parser) path, kept for comparison and odd markup"""
+
+    def iter_hrefs(self, body, encoding):
+        if isinstance(body, bytes):
+            body = body.decode(encoding, errors='replace')
+        soup = BeautifulSoup(body, 'html.parser')
+        for link in soup.find_all('a', href=True):
+            yield link['href']
+
+
+LINK_EXTRACTORS = {
+    'streaming': StreamingLinkExtractor,
+    'soup': SoupLinkExtractor,
+}
+
+
+def create_link_extractor(domain, kind='streaming'):
+    """Build a link extractor by name ('streaming' or 'soup')"""
+    try:
+        return LINK_EXTRACTORS[kind](domain)
+    except KeyError:
+        raise ValueError(f"Unknown link extractor '{kind}', expected one of {sorted(LINK_EXTRACTORS)}")
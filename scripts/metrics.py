@@ -0,0 +1,137 @@
+import bisect
+import contextlib
+import threading
+import time
+
+import aiohttp
+
+# Upper bounds in seconds: 0.1ms doubling up to ~3.5 minutes
+BUCKET_BOUNDS = tuple(0.0001 * 2 ** i for i in range(22))
+
+
+class Histogram:
+    """Fixed log-scale latency histogram: O(log buckets) per observation and constant memory"""
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (0 < q <= 1); exact to within one bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total': round(self.sum, 4),
+            'mean': round(self.sum / self.count, 5) if self.count else 0.0,
+            'p50': round(self.percentile(0.5), 5),
+            'p90': round(self.percentile(0.9), 5),
+            'p99': round(self.percentile(0.99), 5),
+            'max': round(self.max, 5),
+        }
+
+
+class MetricsRegistry:
+    """
+    Named latency histograms for the crawl, validation and sitemap-writing hot paths.
+
+    Phase names are dotted, e.g. 'http.dns', 'crawl.parse', 'validate.url'.
+    A registry created with a `parent` forwards every observation to it, so a
+    single run can report its own numbers while the process-wide registry
+    behind /metrics keeps the totals.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+        if self.parent is not None:
+            self.parent.observe(name, seconds)
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """{phase: {count, total, mean, p50, p90, p99, max}} in seconds"""
+        with self.lock:
+            return {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}
+
+    def prometheus(self, prefix='sitemap'):
+        """The histograms in Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name.replace('.', '_')}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.sum}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def trace_config(self):
+        """
+        An aiohttp TraceConfig recording connection-pool wait, DNS, connect
+        (which includes DNS) and time-to-headers ('http.ttfb') for every
+        request of the session it is attached to.
+        """
+        def started(key):
+            async def callback(session, ctx, params):
+                setattr(ctx, key, time.perf_counter())
+            return callback
+
+        def ended(key, name):
+            async def callback(session, ctx, params):
+                start = getattr(ctx, key, None)
+                if start is not None:
+                    self.observe(name, time.perf_counter() - start)
+            return callback
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(started('request_start'))
+        trace_config.on_request_end.append(ended('request_start', 'http.ttfb'))
+        trace_config.on_connection_queued_start.append(started('queued_start'))
+        trace_config.on_connection_queued_end.append(ended('queued_start', 'http.pool_wait'))
+        trace_config.on_dns_resolvehost_start.append(started('dns_start'))
+        trace_config.on_dns_resolvehost_end.append(ended('dns_start', 'http.dns'))
+        trace_config.on_connection_create_start.append(started('connect_start'))
+        trace_config.on_connection_create_end.append(ended('connect_start', 'http.connect'))
+        return trace_config
+
+
+# Process-wide totals, served by the Flask app's /metrics endpoint
+METRICS = MetricsRegistry()
@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import aiohttp
+
+try:
+    from scripts.comprehensive_sitemap import ComprehensiveFinploySitemap
+    from scripts.metrics import METRICS
+    from scripts.sitemap_validator import SitemapValidator
+    from scripts.validation_report import ValidationReportWriter
+except ImportError:  # running as `python scripts/multi_site.py`
+    from comprehensive_sitemap import ComprehensiveFinploySitemap
+    from metrics import METRICS
+    from sitemap_validator import SitemapValidator
+    from validation_report import ValidationReportWriter
+
+# The sites generated in one run, with the files each one writes
+SITES = [
+    {
+        'base_url': "https://www.finploy.com",
+        'filename': "comprehensive_sitemap.xml",
+        'index_filename': "sitemap_index.xml",
+        'report_file': "validation_report_main.jsonl",
+    },
+    {
+        'base_url': "https://finploy.co.uk",
+        'filename': "comprehensive_sitemap_uk.xml",
+        'index_filename': "sitemap_index_uk.xml",
+        'report_file': "validation_report_uk.jsonl",
+    },
+]
+
+
+class MultiSiteGenerator:
+    """
+    Crawls (and optionally validates) several sites at the same time on one event loop.
+
+    Every site gets its own generator, so its own frontier, seeds and per-host
+    rate limit, but all of them share one aiohttp connection pool. Total time
+    is close to the slowest site's rather than the sum. Each site's sitemap
+    is validated as soon as it is written, while other sites are still
+    crawling. A site that fails is reported in the summary without stopping
+    the others.
+    """
+
+    def __init__(self, sites=None, http_cache=None, validate=True, max_workers_per_site=10,
+                 max_validation_concurrency=20, state_dir=None):
+        self.sites = sites or SITES
+        self.http_cache = http_cache
+        self.validate = validate
+        self.max_workers_per_site = max_workers_per_site
+        self.max_validation_concurrency = max_validation_concurrency
+        # Per-site crawl checkpoints (<netloc>.sqlite) when given
+        self.state_dir = state_dir
+
+    def create_session(self):
+        """One pool for every site; each host may use as many connections as one site's busiest stage"""
+        per_host = max(self.max_workers_per_site, self.max_validation_concurrency if self.validate else 0)
+        connector = aiohttp.TCPConnector(
+            limit=per_host * len(self.sites),
+            limit_per_host=per_host,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'},
+            timeout=aiohttp.ClientTimeout(total=5),
+            trace_configs=[METRICS.trace_config()],
+        )
+
+    async def run_site(self, session, site, **sitemap_options):
+        """Generate, then validate, one site; returns its summary row"""
+        base_url = site['base_url']
+        generator = ComprehensiveFinploySitemap(base_url, http_cache=self.http_cache)
+        state_file = None
+        if self.state_dir:
+            state_file = os.path.join(self.state_dir, f"{urlparse(base_url).netloc}.sqlite")
+
+        start_time = time.time()
+        sitemap_file, url_count = await generator.create_comprehensive_sitemap_async(
+            site['filename'], index_filename=site['index_filename'], state_file=state_file,
+            session=session, **sitemap_options)
+        row = {
+            'base_url': base_url,
+            'sitemap_file': sitemap_file,
+            'total_urls': url_count,
+            'crawl_seconds': round(time.time() - start_time, 2),
+        }
+
+        if self.validate:
+            validation_start = time.time()
+            validator = SitemapValidator(sitemap_file, http_cache=self.http_cache)
+            with ValidationReportWriter(site['report_file'], sitemap_file, metrics=validator.metrics) as report_writer:
+                await validator.validate_all_urls(max_concurrent=self.max_validation_concurrency, session=session,
+                                                  sink=report_writer.write, keep_results=False)
+            report = report_writer.report()
+            row.update({
+                'report_file': report['report_file'],
+                'validation': report['summary'],
+                'validation_seconds': round(time.time() - validation_start, 2),
+            })
+        return row
+
+    async def run_async(self, summary_file=None, **sitemap_options):
+        """
+        Run every site concurrently. sitemap_options are passed to each site's
+        create_comprehensive_sitemap_async. Returns the combined summary, also
+        written to summary_file when given.
+        """
+        start_time = time.time()
+        async with self.create_session() as session:
+            outcomes = await asyncio.gather(
+                *(self.run_site(session, site, **sitemap_options) for site in self.sites),
+                return_exceptions=True,
+            )
+
+        sites = []
+        for site, outcome in zip(self.sites, outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, (KeyboardInterrupt, asyncio.CancelledError)):
+                    raise outcome
+                sites.append({'base_url': site['base_url'], 'error': f"{type(outcome).__name__}: {outcome}"})
+            else:
+                sites.append(outcome)
+
+        succeeded = [row for row in sites if 'error' not in row]
+        summary = {
+            'generated_at': datetime.now().isoformat(),
+            'time_taken': round(time.time() - start_time, 2),
+            'total_urls': sum(row['total_urls'] for row in succeeded),
+            'sites': sites,
+        }
+        if self.validate:
+            summary['validation'] = {
+                key: sum(row['validation'][key] for row in succeeded)
+                for key in ('accessible', 'errors', 'redirects')
+            }
+        if summary_file:
+            with open(summary_file, 'w') as f:
+                json.dump(summary, f, indent=2)
+        self.print_summary(summary, summary_file)
+        return summary
+
+    def run(self, summary_file=None, **sitemap_options):
+        """Synchronous entry point for run_async"""
+        return asyncio.run(self.run_async(summary_file, **sitemap_options))
+
+    @staticmethod
+    def print_summary(summary, summary_file=None):
+        print(f"\n🎉 FINAL RESULTS ({summary['time_taken']:.2f} seconds for {len(summary['sites'])} sites):")
+        for row in summary['sites']:
+            site = urlparse(row['base_url']).netloc
+            if 'error' in row:
+                print(f"❌ {site}: failed ({row['error']})")
+                continue
+            line = f"📊 {site}: {row['total_urls']} URLs in {row['sitemap_file']} ({row['crawl_seconds']:.2f}s)"
+            if 'validation' in row:
+                line += (f", {row['validation']['accessible']} accessible / {row['validation']['errors']} errors"
+                         f" ({row['validation_seconds']:.2f}s)")
+            print(line)
+        print(f"🎯 Total URLs: {summary['total_urls']}")
+        if summary_file:
+            print(f"📁 Summary saved as: {summary_file}")
+
+
+# Main execution
+if __name__ == "__main__":
+    MultiSiteGenerator().run(summary_file="multi_site_summary.json")
@@ -0,0 +1,83 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from scripts.link_extractor import create_link_extractor
+except ImportError:  # running from inside scripts/
+    from link_extractor import create_link_extractor
+
+# One extractor per (kind, domain) per worker process, built on first use
+_worker_extractors = {}
+
+
+def extract_links_in_worker(kind, domain, page_url, body, encoding):
+    """Runs inside a parser process; must stay a module-level function so it pickles"""
+    extractor = _worker_extractors.get((kind, domain))
+    if extractor is None:
+        extractor = _worker_extractors[(kind, domain)] = create_link_extractor(domain, kind)
+    return extractor.extract(page_url, body, encoding)
+
+
+class ParsePipeline:
+    """
+    Hands raw page bodies from the I/O side to a pool of parser processes.
+
+    Fetchers put bodies on a bounded queue and await the parsed links. When
+    the parsers fall behind the queue fills up, and fetchers block on it while
+    holding their fetch slot. That is the backpressure that stops the crawler
+    from downloading faster than it can parse.
+    """
+
+    def __init__(self, domain, extractor_kind='streaming', workers=None, queue_size=None):
+        self.domain = domain
+        self.extractor_kind = extractor_kind
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size or self.workers * 2
+        self.queue = None
+        self.executor = None
+        self.consumers = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.consumers = [asyncio.ensure_future(self._consume()) for _ in range(self.workers)]
+
+    async def submit(self, page_url, body, encoding=None):
+        """Queue a body for parsing and wait for its links"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((page_url, body, encoding, future))
+        return await future
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            page_url, body, encoding, future = await self.queue.get()
+            try:
+                links = await loop.run_in_executor(
+                    self.executor, extract_links_in_worker,
+                    self.extractor_kind, self.domain, page_url, body, encoding,
+                )
+                if not future.done():
+                    future.set_result(links)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def close(self):
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        self.consumers = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,51 @@
+import time
+
+
+class Cancelled(Exception):
+    """Raised when a crawl or validation is asked to stop early"""
+
+
+class ProgressTracker:
+    """
+    Turns crawler/validator counters into throttled progress events.
+
+    `callback` receives a dict with counts, queue depth, pages/sec and error
+    rate at most once per `interval` seconds (plus a final forced update).
+    `should_stop` is polled by the hot loops; when it returns True they wind
+    down and raise Cancelled.
+    """
+
+    def __init__(self, callback=None, should_stop=None, phase='crawl', interval=1.0):
+        self.callback = callback
+        self.should_stop = should_stop
+        self.phase = phase
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_emit = 0.0
+
+    def stop_requested(self):
+        return bool(self.should_stop and self.should_stop())
+
+    def check_cancelled(self):
+        if self.stop_requested():
+            raise Cancelled(f"{self.phase} cancelled")
+
+    def update(self, processed, succeeded, errors, queued=0, in_flight=0, force=False):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        if not force and now - self.last_emit < self.interval:
+            return
+        self.last_emit = now
+        elapsed = max(now - self.started, 1e-6)
+        self.callback({
+            'phase': self.phase,
+            'processed': processed,
+            'succeeded': succeeded,
+            'errors': errors,
+            'queued': queued,
+            'in_flight': in_flight,
+            'pages_per_sec': round(processed / elapsed, 2),
+            'error_rate': round(errors / processed, 4) if processed else 0.0,
+            'elapsed': round(elapsed, 1),
+        })
@@ -0,0 +1,127 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds, or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of polling.
+
+    Tokens may go negative: each caller takes one immediately and is told how
+    long to wait for it, so concurrent callers queue up fairly without a lock.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take one token and return the number of seconds to wait before using it"""
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        wait = max(0.0, self.updated - now)
+        if self.tokens < 0:
+            wait += -self.tokens / self.rate
+        return wait
+
+    def block_for(self, seconds):
+        """Drain the bucket and hold off refilling for `seconds`"""
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+
+class HostRateLimiter:
+    """
+    Per-domain politeness scheduler.
+
+    Every host gets its own token bucket refilling at `rate` requests/second
+    with a `burst` allowance. 429/503 responses push the host's bucket back by
+    the server's Retry-After, or by an exponential backoff when none is sent.
+    """
+
+    def __init__(self, rate, burst=1, base_backoff=1.0, max_backoff=60.0):
+        self.rate = rate
+        self.burst = burst
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.buckets = {}
+        self.host_rates = {}
+        self.host_bursts = {}
+        self.strikes = {}
+        self.blocked_until = {}
+
+    @staticmethod
+    def host_of(url_or_host):
+        return urlparse(url_or_host).netloc if '://' in url_or_host else url_or_host
+
+    def set_rate(self, host, rate, burst=None):
+        """Override the rate (and optionally the burst) for a single host"""
+        self.host_rates[host] = rate
+        if burst is not None:
+            self.host_bursts[host] = burst
+        self.buckets.pop(host, None)
+
+    def bucket(self, host):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            rate = self.host_rates.get(host, self.rate)
+            if not rate:
+                return None
+            bucket = self.buckets[host] = TokenBucket(rate, self.host_bursts.get(host, self.burst))
+        return bucket
+
+    async def acquire(self, url_or_host):
+        """Wait until a request to this host is allowed; returns the time spent waiting"""
+        host = self.host_of(url_or_host)
+        waited = 0.0
+        blocked = self.blocked_until.get(host, 0.0) - time.monotonic()
+        if blocked > 0:
+            await asyncio.sleep(blocked)
+            waited += blocked
+        bucket = self.bucket(host)
+        if bucket is not None:
+            wait = bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                waited += wait
+        return waited
+
+    def penalize(self, url_or_host, retry_after=None):
+        """Back a host off after a 429/503; returns the delay applied"""
+        host = self.host_of(url_or_host)
+        strikes = self.strikes.get(host, 0) + 1
+        self.strikes[host] = strikes
+        if retry_after is None:
+            retry_after = self.base_backoff * (2 ** (strikes - 1))
+        retry_after = min(self.max_backoff, retry_after)
+        self.blocked_until[host] = max(self.blocked_until.get(host, 0.0), time.monotonic() + retry_after)
+        bucket = self.bucket(host)
+        if bucket is not None:
+            bucket.block_for(retry_after)
+        return retry_after
+
+    def record_success(self, url_or_host):
+        self.strikes.pop(self.host_of(url_or_host), None)
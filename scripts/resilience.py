@@ -0,0 +1,257 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+
+import aiohttp
+
+try:
+    from scripts.rate_limiter import HostRateLimiter
+except ImportError:  # running from inside scripts/
+    from rate_limiter import HostRateLimiter
+
+# Server errors worth another attempt; 429/503 are backed off by the HostRateLimiter instead
+RETRYABLE_STATUSES = (500, 502, 504)
+# Failures that say nothing about the page itself, only about the connection
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+
+
+class RetryableStatus(Exception):
+    """Raised by a request function for a response that should be retried"""
+
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request to a host that keeps failing"""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter: attempt n waits uniform(0, min(max_delay, base_delay * 2**(n-1)))"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=10.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class _HostCircuit:
+    def __init__(self, window):
+        self.state = CircuitBreaker.CLOSED
+        self.outcomes = collections.deque(maxlen=window)
+        self.open_until = 0.0
+        self.trips = 0
+        self.probe_started = None
+
+
+class CircuitBreaker:
+    """
+    Per-host error-rate circuit breaker.
+
+    While closed, the last `window` outcomes are tracked; once at least
+    `min_requests` are in and `error_threshold` of them failed, the circuit
+    opens and requests to that host wait out a cooldown (doubling with every
+    consecutive trip, up to `max_cooldown`). Then a single probe request is let
+    through: success closes the circuit, failure opens it again. After
+    `max_trips` trips without a single success the host is treated as down
+    and requests fail fast with CircuitOpenError.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=20, min_requests=10, error_threshold=0.5, cooldown=5.0, max_cooldown=60.0,
+                 max_trips=4):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_trips = max_trips
+        self.hosts = {}
+        self.trip_count = 0
+        self.lock = threading.Lock()
+
+    def _circuit(self, host):
+        circuit = self.hosts.get(host)
+        if circuit is None:
+            circuit = self.hosts[host] = _HostCircuit(self.window)
+        return circuit
+
+    def state(self, host):
+        with self.lock:
+            return self._circuit(host).state
+
+    def before_request(self, host):
+        """Seconds to wait before a request to `host` may go out (0 means now); raises CircuitOpenError if it is down"""
+        now = time.monotonic()
+        with self.lock:
+            circuit = self._circuit(host)
+            if circuit.trips >= self.max_trips:
+                raise CircuitOpenError(f"{host} failed {circuit.trips} times in a row; giving up on it")
+            if circuit.state == self.OPEN:
+                if now < circuit.open_until:
+                    return circuit.open_until - now
+                circuit.state = self.HALF_OPEN
+                circuit.probe_started = None
+            if circuit.state == self.HALF_OPEN:
+                # One probe at a time; a probe that never reports back is replaced after a cooldown
+                if circuit.probe_started is not None and now - circuit.probe_started < self.cooldown:
+                    return min(1.0, self.cooldown)
+                circuit.probe_started = now
+            return 0.0
+
+    def record(self, host, ok):
+        with self.lock:
+            circuit = self._circuit(host)
+            if ok:
+                circuit.state = self.CLOSED
+                circuit.trips = 0
+                circuit.probe_started = None
+                circuit.outcomes.append(True)
+                return
+            if circuit.state == self.HALF_OPEN:
+                self._trip(circuit)
+            elif circuit.state == self.CLOSED:
+                circuit.outcomes.append(False)
+                failures = circuit.outcomes.count(False)
+                if len(circuit.outcomes) >= self.min_requests and \
+                        failures / len(circuit.outcomes) >= self.error_threshold:
+                    self._trip(circuit)
+
+    def _trip(self, circuit):
+        circuit.trips += 1
+        circuit.state = self.OPEN
+        circuit.open_until = time.monotonic() + min(self.max_cooldown, self.cooldown * 2 ** (circuit.trips - 1))
+        circuit.outcomes.clear()
+        circuit.probe_started = None
+        self.trip_count += 1
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit for one host: grows by one slot per `limit`
+    successful requests up to max_limit, and halves on a timeout (at most once
+    per `decrease_interval` seconds, so one burst of timeouts counts once).
+    """
+
+    def __init__(self, max_limit, min_limit=1, decrease_interval=1.0):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_interval = decrease_interval
+        self.limit = float(max_limit)
+        self.in_use = 0
+        self.waiters = collections.deque()
+        self.last_decrease = 0.0
+
+    async def acquire(self):
+        while self.in_use >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Hand a wake-up we may have consumed to the next waiter
+                self._wake()
+                raise
+        self.in_use += 1
+
+    def release(self):
+        self.in_use -= 1
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_use
+        while free > 0 and self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def on_success(self):
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._wake()
+
+    def on_timeout(self):
+        now = time.monotonic()
+        if now - self.last_decrease >= self.decrease_interval:
+            self.limit = max(self.min_limit, self.limit / 2)
+            self.last_decrease = now
+
+
+class ResilienceLayer:
+    """
+    Retry, circuit breaking and adaptive concurrency around single requests,
+    shared by the crawler and the validator.
+
+    call() runs a request function under the host's circuit breaker and AIMD
+    concurrency limit. Connection errors, timeouts and RetryableStatus are
+    retried with jittered exponential backoff; anything else is returned or
+    raised untouched. `stats` counts retries, timeouts and fast failures.
+    """
+
+    def __init__(self, max_concurrency=10, retry=None, breaker=None, min_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.limiters = {}
+        self.stats = collections.Counter()
+
+    def concurrency(self, host):
+        limiter = self.limiters.get(host)
+        if limiter is None:
+            limiter = self.limiters[host] = AdaptiveConcurrency(self.max_concurrency, self.min_concurrency)
+        return limiter
+
+    def summary(self):
+        summary = dict(self.stats)
+        summary['circuit_trips'] = self.breaker.trip_count
+        return summary
+
+    def _before_request(self, host):
+        try:
+            return self.breaker.before_request(host)
+        except CircuitOpenError:
+            self.stats['fast_failures'] += 1
+            raise
+
+    async def call(self, url, request):
+        """Return `await request()`, retrying transient failures; the last failure is re-raised"""
+        host = HostRateLimiter.host_of(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            wait = self._before_request(host)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self._before_request(host)
+
+            limiter = self.concurrency(host)
+            await limiter.acquire()
+            try:
+                result = await request()
+            except (RetryableStatus,) + TRANSIENT_ERRORS as e:
+                self.breaker.record(host, False)
+                if isinstance(e, asyncio.TimeoutError):
+                    self.stats['timeouts'] += 1
+                    limiter.on_timeout()
+                if attempt >= self.retry.max_attempts:
+                    raise
+                self.stats['retries'] += 1
+            else:
+                self.breaker.record(host, True)
+                limiter.on_success()
+                return result
+            finally:
+                limiter.release()
+            await asyncio.sleep(self.retry.delay(attempt))
+
@@ -0,0 +1,157 @@
+import collections
+import json
+import os
+import threading
+import time
+from array import array
+
+# Filters accepted by ValidationResults.page(); any other value is treated as an HTTP status code
+STATUS_FILTERS = ('all', 'ok', 'error', 'redirect')
+
+
+def result_row(url, result):
+    """Flatten one validator result into the row shown by the dashboard and results page"""
+    status_text = f"{result['status']} {'OK' if result['accessible'] else 'Error'}"
+    if result.get('redirect'):
+        status_text += " (Redirect)"
+    return {
+        "url": url,
+        "status_text": status_text,
+        "status_code": result['status'],
+        "accessible": result['accessible'],
+        "redirect": result.get('redirect', False),
+        "final_url": result.get('final_url'),
+    }
+
+
+def row_category(row):
+    if not row['accessible']:
+        return 'error'
+    if row['redirect']:
+        return 'redirect'
+    return 'ok'
+
+
+class ValidationResults:
+    """
+    One validation run, served from its JSON Lines report (see validation_report.py).
+
+    The report is read once to index the byte offset of every row by status
+    category and by HTTP status; only those offsets stay in memory, and a
+    page is read back with one seek per row. The report must not change
+    afterwards, so pass a published (content-addressed) copy of it.
+    """
+
+    def __init__(self, sitemap_file, report_file, summary, created_at=None):
+        self.sitemap_file = sitemap_file
+        self.report_file = report_file
+        self.summary = summary
+        self.created_at = created_at or time.time()
+        self.offsets = array('q')
+        self.by_category = {category: array('q') for category in STATUS_FILTERS if category != 'all'}
+        self.by_status = {}
+        with open(report_file, 'rb') as f:
+            f.readline()  # header
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                row = json.loads(line)
+                if 'url' not in row:
+                    break  # trailer
+                self.offsets.append(offset)
+                self.by_category[row_category(row)].append(offset)
+                self.by_status.setdefault(row['status'], array('q')).append(offset)
+
+    def counts(self):
+        counts = {category: len(offsets) for category, offsets in self.by_category.items()}
+        counts['all'] = len(self.offsets)
+        return counts
+
+    def _matching(self, status_filter):
+        if status_filter in (None, '', 'all'):
+            return self.offsets
+        if status_filter in self.by_category:
+            return self.by_category[status_filter]
+        try:
+            code = int(status_filter)
+        except ValueError:
+            raise ValueError(f"Unknown status filter {status_filter!r}")
+        return self.by_status.get(code, array('q'))
+
+    def page(self, status_filter='all', page=1, per_page=100):
+        """Return (rows, total_matching) for one 1-based page of the filtered results"""
+        matching = self._matching(status_filter)
+        start = (max(page, 1) - 1) * per_page
+        rows = []
+        with open(self.report_file, 'rb') as f:
+            for offset in matching[start:start + per_page]:
+                f.seek(offset)
+                row = json.loads(f.readline())
+                rows.append(result_row(row['url'], row))
+        return rows, len(matching)
+
+
+class ValidationResultsStore:
+    """
+    In-process cache of validation results shared by the validation job and
+    the results page.
+
+    Entries are keyed by the sitemap's path and modification time, so
+    regenerating the sitemap invalidates its results automatically, and they
+    expire `ttl` seconds after the validation finished. Only the most recent
+    `max_entries` sitemaps are kept.
+    """
+
+    def __init__(self, ttl=3600, max_entries=8):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key_for(sitemap_file):
+        """(absolute path, mtime) of the sitemap; None when it does not exist"""
+        path = os.path.abspath(sitemap_file)
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def put(self, key, sitemap_file, report_file, summary):
+        """
+        Store a finished run, indexing its JSONL report_file. `key` should come
+        from key_for() taken before the run started, so results are never
+        attributed to a sitemap that was rewritten while they were being collected.
+        """
+        entry = ValidationResults(sitemap_file, report_file, dict(summary))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def get(self, sitemap_file):
+        """Results for the sitemap as it is on disk now, or None if missing, stale or expired"""
+        key = self.key_for(sitemap_file)
+        if key is None:
+            return None
+        with self.lock:
+            # Drop results for older versions of this sitemap
+            for stale in [k for k in self.entries if k[0] == key[0] and k != key]:
+                del self.entries[stale]
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry.created_at > self.ttl or not os.path.exists(entry.report_file):
+                del self.entries[key]
+                return None
+            return entry
+
+    def invalidate(self, sitemap_file):
+        path = os.path.abspath(sitemap_file)
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == path]:
+                del self.entries[key]
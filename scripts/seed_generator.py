@@ -0,0 +1,112 @@
+import collections
+
+try:
+    from scripts.url_index import canonicalize_url
+except ImportError:  # running from inside scripts/
+    from url_index import canonicalize_url
+
+
+class SeedFamily:
+    """One URL pattern's speculative seeds (e.g. '/sales-loans-jobs-in-*') and how they have fared"""
+
+    def __init__(self, name, tier, first_url, rest):
+        self.name = name
+        self.tier = tier
+        self.pending = first_url
+        self.rest = rest
+        self.attempts = 0
+        self.hits = 0
+        self.pruned = False
+
+    def next_url(self):
+        """The family's next seed, or None when it is used up"""
+        url, self.pending = self.pending, None
+        if url is None:
+            url = next(self.rest, None)
+        return url
+
+
+class PrioritizedSeeds:
+    """
+    Lazily feeds speculative seed URLs into a crawl frontier, best tier first.
+
+    Families are (name, urls) pairs; urls may be any iterable and is only
+    advanced as seeds are needed. Families are visited by the tier of their
+    first seed (lowest first), round-robin within a tier, so every pattern
+    gets sampled early.
+    Once a family has had min_samples of its seeds fetched and fewer than
+    min_hit_rate of them were accessible, the rest of it is never generated.
+    Pages from a pruned family can still be found by following links.
+    fill(below_tier=...) only queues seeds that would be popped ahead of
+    everything already queued, so good families are not left waiting behind
+    a frontier full of lower-tier links.
+    """
+
+    def __init__(self, families, tier_of, min_samples=8, min_hit_rate=0.1):
+        self.min_samples = min_samples
+        self.min_hit_rate = min_hit_rate
+        tiers = collections.defaultdict(list)
+        for name, urls in families:
+            urls = iter(urls)
+            first = next(urls, None)
+            if first is not None:
+                family = SeedFamily(name, tier_of(first), first, urls)
+                tiers[family.tier].append(family)
+        self.families = [family for tier in sorted(tiers) for family in tiers[tier]]
+        self.tiers = collections.deque(collections.deque(tiers[tier]) for tier in sorted(tiers))
+        # Seeds handed to the frontier whose outcome is not in yet
+        self.in_flight = {}
+        self.generated = 0
+
+    def _next_seed(self, below_tier=None):
+        while self.tiers:
+            families = self.tiers[0]
+            while families:
+                if below_tier is not None and families[0].tier >= below_tier:
+                    return None, None
+                family = families.popleft()
+                url = None if family.pruned else family.next_url()
+                if url is not None:
+                    families.append(family)
+                    return family, url
+            self.tiers.popleft()
+        return None, None
+
+    def exhausted(self):
+        return not self.tiers
+
+    def fill(self, frontier, count, below_tier=None):
+        """
+        Queue up to `count` new seeds (ones the frontier has not seen), only from
+        families ranked before below_tier when it is given; returns how many were queued
+        """
+        queued = 0
+        while queued < count:
+            family, url = self._next_seed(below_tier)
+            if url is None:
+                break
+            url = canonicalize_url(url)
+            if frontier.add(url):
+                self.in_flight[url] = family
+                self.generated += 1
+                queued += 1
+        return queued
+
+    def record(self, url, accessible):
+        """Count a fetched seed's outcome against its family and prune the family if it keeps missing"""
+        family = self.in_flight.pop(url, None)
+        if family is None:
+            return
+        family.attempts += 1
+        family.hits += accessible
+        if not family.pruned and family.attempts >= self.min_samples and \
+                family.hits < self.min_hit_rate * family.attempts:
+            family.pruned = True
+
+    def summary(self):
+        pruned = [family for family in self.families if family.pruned]
+        return {
+            'families': len(self.families),
+            'seeds_queued': self.generated,
+            'pruned': [f"{family.name} ({family.hits}/{family.attempts})" for family in pruned],
+        }
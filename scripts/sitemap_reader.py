@@ -0,0 +1,64 @@
+import gzip
+import io
+import os
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def open_sitemap_stream(raw):
+    """Wrap a binary stream so that a gzipped sitemap reads as plain XML"""
+    stream = raw if hasattr(raw, 'peek') else io.BufferedReader(raw)
+    if stream.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+
+def iter_sitemap_entries(raw):
+    """
+    Yield ('url', loc, lastmod) for every page of a sitemap, or ('sitemap',
+    loc, lastmod) for every child of a sitemap index, from a binary stream
+    (plain or gzipped). Uses iterparse and clears each entry once it is
+    read, so memory stays flat however large the file is. lastmod is None
+    where the entry has none; loc is as written (callers resolve it).
+    """
+    root = None
+    loc = lastmod = None
+    for event, elem in ET.iterparse(open_sitemap_stream(raw), events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if root is None:
+                root = elem
+            continue
+        if tag == 'loc':
+            loc = (elem.text or '').strip()
+        elif tag == 'lastmod':
+            lastmod = (elem.text or '').strip() or None
+        elif tag in ('url', 'sitemap'):
+            if loc:
+                yield tag, loc, lastmod
+            loc = lastmod = None
+            # Drop finished entries so the tree never grows
+            root.clear()
+
+
+def local_child_sitemap(loc, index_path):
+    """Where a sitemap-index child would be on disk: its file name, next to the index"""
+    return os.path.join(os.path.dirname(index_path), os.path.basename(urlparse(loc).path))
+
+
+def read_sitemap_entries(path, max_depth=2):
+    """
+    Yield (loc, lastmod) for every <url> in a local sitemap, .xml.gz sitemap or
+    sitemap index written by StreamingSitemapWriter. Index children are read
+    from the index's own directory. lastmod is None where the entry has none.
+    """
+    with open(path, 'rb') as f:
+        for kind, loc, lastmod in iter_sitemap_entries(f):
+            if kind == 'url':
+                yield loc, lastmod
+            elif max_depth > 0:
+                child = local_child_sitemap(loc, path)
+                if os.path.exists(child):
+                    yield from read_sitemap_entries(child, max_depth - 1)
@@ -1,31 +1,91 @@
-import xml.etree.ElementTree as ET
 import requests
-from urllib.parse import urlparse
+from urllib.parse import urljoin
 import asyncio
 import aiohttp
-from datetime import datetime
-import json
+import itertools
 import os
+import time
+
+try:
+    from scripts.metrics import METRICS, MetricsRegistry
+    from scripts.resilience import RETRYABLE_STATUSES, ResilienceLayer, RetryableStatus
+    from scripts.sitemap_reader import iter_sitemap_entries, local_child_sitemap
+    from scripts.validation_report import ValidationReportWriter
+except ImportError:  # running from inside scripts/
+    from metrics import METRICS, MetricsRegistry
+    from resilience import RETRYABLE_STATUSES, ResilienceLayer, RetryableStatus
+    from sitemap_reader import iter_sitemap_entries, local_child_sitemap
+    from validation_report import ValidationReportWriter
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+# Servers that refuse HEAD answer with these; the page is then checked with a one-byte GET
+HEAD_FALLBACK_STATUSES = (403, 405, 501)
+VALIDATION_MODES = ('resolve', 'head')
 
 class SitemapValidator:
-    def __init__(self, sitemap_file):
+    def __init__(self, sitemap_file, http_cache=None, cache_fresh_for=3600, resilience=None, mode='resolve',
+                 max_redirects=5):
         self.sitemap_file = sitemap_file
         self.urls = []
         self.validation_results = {}
+        self.total_urls = 0
+        self.summary = {'accessible': 0, 'errors': 0, 'redirects': 0}
+        # Shared with the crawler: pages it fetched recently are not re-checked,
+        # older ones are revalidated with a conditional HEAD
+        self.http_cache = http_cache
+        self.cache_fresh_for = cache_fresh_for
+        # Retries transient failures so one blip doesn't mark a page dead; created per run when not given
+        self.resilience = resilience
+        # 'resolve' falls back to a ranged GET when HEAD is refused and follows redirects up to
+        # max_redirects hops to the final page; 'head' is a single HEAD as before
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown validation mode {mode!r}; expected one of {', '.join(VALIDATION_MODES)}")
+        self.mode = mode
+        self.max_redirects = max_redirects
+        # This run's phase timings (also added to the process-wide totals); written into the report
+        self.metrics = MetricsRegistry(parent=METRICS)
         
+    def _open_sitemap(self, source):
+        """Open a local or remote sitemap as a binary stream (gzip is handled by the reader)"""
+        if source.startswith(('http://', 'https://')):
+            response = requests.get(source, stream=True, timeout=30)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            # Left open at EOF so the reader's buffered wrapper can finish with it
+            response.raw.auto_close = False
+            return response.raw
+        return open(source, 'rb')
+
+    def _resolve_child_sitemap(self, loc, parent):
+        """Prefer a local copy of a sitemap-index child (same directory as the index) over downloading it"""
+        if not parent.startswith(('http://', 'https://')):
+            local = local_child_sitemap(loc, parent)
+            if os.path.exists(local):
+                return local
+        return loc
+
+    def iter_urls(self, source=None, depth=0):
+        """
+        Lazily yield page URLs from a sitemap, .xml.gz sitemap or sitemap index.
+        Uses iterparse and clears elements as it goes, so memory stays flat
+        and callers can start on the first URL before the file is fully read.
+        """
+        source = source or self.sitemap_file
+        stream = self._open_sitemap(source)
+        try:
+            for kind, loc, _ in iter_sitemap_entries(stream):
+                if kind == 'url':
+                    yield loc
+                elif depth < 2:
+                    yield from self.iter_urls(self._resolve_child_sitemap(loc, source), depth + 1)
+        finally:
+            stream.close()
+
     def parse_sitemap(self):
         """Parse the XML sitemap and extract URLs"""
         try:
-            tree = ET.parse(self.sitemap_file)
-            root = tree.getroot()
-            
-            # Handle namespace
-            namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            
-            for url_elem in root.findall('.//ns:url', namespace):
-                loc_elem = url_elem.find('ns:loc', namespace)
-                if loc_elem is not None:
-                    self.urls.append(loc_elem.text)
+            for url in self.iter_urls():
+                self.urls.append(url)
             
             print(f"Parsed {len(self.urls)} URLs from sitemap")
             return self.urls
@@ -33,81 +93,251 @@ class SitemapValidator:
             print(f"Error parsing sitemap: {e}")
             return []
     
-    async def validate_url(self, session, url, semaphore):
+    async def validate_url(self, session, url, semaphore=None):
         """Validate a single URL"""
+        with self.metrics.timer('validate.url'):
+            return await self._validate_url(session, url, semaphore)
+
+    async def _validate_url(self, session, url, semaphore):
+        cached = self.http_cache.get(url) if self.http_cache else None
+        if cached and cached['status'] == 200 and time.time() - cached['fetched_at'] < self.cache_fresh_for:
+            return {
+                'url': url,
+                'status': cached['status'],
+                'accessible': True,
+                'redirect': False,
+                'cached': True
+            }
+
+        if semaphore is None:
+            return await self._check_url(session, url, cached)
         async with semaphore:
-            try:
-                async with session.head(url, timeout=10) as response:
-                    return {
-                        'url': url,
-                        'status': response.status,
-                        'accessible': response.status < 400,
-                        'redirect': response.status in [301, 302, 303, 307, 308]
-                    }
-            except Exception as e:
+            return await self._check_url(session, url, cached)
+
+    async def _check_url(self, session, url, cached):
+        headers = self.http_cache.conditional_headers(url, cached) if cached else None
+        if self.resilience is None:
+            self.resilience = ResilienceLayer()
+        try:
+            return await self.resilience.call(url, lambda: self._probe(session, url, cached, headers))
+        except RetryableStatus as e:
+            # Still failing after the retries: report the server's answer
+            return {
+                'url': url,
+                'status': e.status,
+                'accessible': False,
+                'redirect': False
+            }
+        except Exception as e:
+            return {
+                'url': url,
+                'status': None,
+                'accessible': False,
+                'error': str(e)
+            }
+
+    async def _request_once(self, session, method, url, headers):
+        """One request without following redirects; returns (status, Location, seconds taken)"""
+        start = time.perf_counter()
+        async with session.request(method, url, timeout=10, headers=headers, allow_redirects=False) as response:
+            if response.status == 206:
+                await response.read()  # the single byte asked for; lets the connection be reused
+            elapsed = time.perf_counter() - start
+            self.metrics.observe('validate.request', elapsed)
+            return response.status, response.headers.get('Location'), elapsed
+
+    async def _probe(self, session, url, cached, headers):
+        """
+        Check one URL. In 'resolve' mode a refused HEAD is retried as a GET for
+        bytes=0-0, and redirects are followed hop by hop (at most max_redirects)
+        so the result describes the final page. Each hop's status and latency
+        are kept in 'hops'; a result that needed the GET fallback has
+        method 'GET'.
+        """
+        hops = []
+        current = url
+        while True:
+            status, location, elapsed = await self._request_once(session, 'HEAD', current, headers)
+            method = 'HEAD'
+            if self.mode == 'resolve' and status in HEAD_FALLBACK_STATUSES:
+                get_headers = dict(headers or {}, Range='bytes=0-0')
+                status, location, get_elapsed = await self._request_once(session, 'GET', current, get_headers)
+                elapsed += get_elapsed
+                method = 'GET'
+                if status == 206:
+                    # The one byte asked for came back, so the page is there: report it like a 200
+                    status = 200
+            if status in RETRYABLE_STATUSES:
+                raise RetryableStatus(status)
+            hops.append({'url': current, 'status': status, 'method': method, 'elapsed': round(elapsed, 4)})
+
+            if status == 304 and cached and len(hops) == 1:
+                self.http_cache.touch(url)
                 return {
                     'url': url,
-                    'status': None,
-                    'accessible': False,
-                    'error': str(e)
+                    'status': cached['status'],
+                    'accessible': True,
+                    'redirect': False,
+                    'cached': True
                 }
-    
-    async def validate_all_urls(self, max_concurrent=20):
-        """Validate all URLs in the sitemap"""
-        if not self.urls:
-            self.parse_sitemap()
-        
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.validate_url(session, url, semaphore) for url in self.urls]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results
-            accessible_count = 0
-            error_count = 0
-            redirect_count = 0
-            
-            for result in results:
-                if isinstance(result, dict):
-                    url = result['url']
-                    self.validation_results[url] = result
-                    
-                    if result['accessible']:
-                        accessible_count += 1
-                    else:
-                        error_count += 1
-                    
-                    if result.get('redirect', False):
-                        redirect_count += 1
-            
-            print(f"\nValidation Results:")
-            print(f"Total URLs: {len(self.urls)}")
-            print(f"Accessible: {accessible_count}")
-            print(f"Errors: {error_count}")
-            print(f"Redirects: {redirect_count}")
-            
-            return self.validation_results
-    
-    def generate_validation_report(self, output_file="validation_report.json"):
-        """Generate a detailed validation report"""
-        report = {
-            'sitemap_file': self.sitemap_file,
-            'validation_date': datetime.now().isoformat(),
-            'total_urls': len(self.urls),
-            'results': self.validation_results,
-            'summary': {
-                'accessible': sum(1 for r in self.validation_results.values() if r.get('accessible', False)),
-                'errors': sum(1 for r in self.validation_results.values() if not r.get('accessible', True)),
-                'redirects': sum(1 for r in self.validation_results.values() if r.get('redirect', False))
-            }
+            if self.mode == 'head' or status not in REDIRECT_STATUSES or not location:
+                break
+
+            target = urljoin(current, location)
+            error = None
+            if any(hop['url'] == target for hop in hops):
+                error = 'redirect loop'
+            elif len(hops) > self.max_redirects:
+                error = f"more than {self.max_redirects} redirects"
+            if error:
+                return self._probe_result(url, hops, current, accessible=False, error=error)
+            # Validators only apply to the URL they were stored for
+            current, headers = target, None
+
+        return self._probe_result(url, hops, current, accessible=hops[-1]['status'] < 400)
+
+    def _probe_result(self, url, hops, final_url, accessible, error=None):
+        result = {
+            'url': url,
+            'status': hops[-1]['status'],
+            'accessible': accessible,
+            'redirect': hops[0]['status'] in REDIRECT_STATUSES,
+            'elapsed': round(sum(hop['elapsed'] for hop in hops), 4)
         }
-        
-        with open(output_file, 'w') as f:
-            json.dump(report, f, indent=2)
-        
-        print(f"Validation report saved to {output_file}")
-        return report
+        if any(hop['method'] == 'GET' for hop in hops):
+            result['method'] = 'GET'
+        if len(hops) > 1 or error:
+            result['final_url'] = final_url
+            result['hops'] = hops
+        if error:
+            result['error'] = error
+        return result
+
+    async def _iter_in_thread(self, iterator, chunk_size=500):
+        """Yield from a blocking iterator, pulling `chunk_size` items at a time in the default executor"""
+        loop = asyncio.get_running_loop()
+        while True:
+            chunk = await loop.run_in_executor(None, lambda: list(itertools.islice(iterator, chunk_size)))
+            if not chunk:
+                return
+            for item in chunk:
+                yield item
+
+    async def _iter_source_urls(self, urls):
+        """Yield URLs from an async iterable, a plain iterable, self.urls or the sitemap stream"""
+        if urls is None:
+            # Reading the sitemap blocks (and downloads it when it is remote), so it happens off the event loop
+            urls = self.urls if self.urls else self._iter_in_thread(self.iter_urls())
+        if hasattr(urls, '__aiter__'):
+            async for url in urls:
+                yield url
+        else:
+            for count, url in enumerate(urls, 1):
+                yield url
+                if count % 100 == 0:
+                    # Parsing is synchronous; let the workers run between chunks
+                    await asyncio.sleep(0)
+
+    def _record(self, result, keep_results):
+        self.total_urls += 1
+        if result['accessible']:
+            self.summary['accessible'] += 1
+        else:
+            self.summary['errors'] += 1
+        if result.get('redirect', False):
+            self.summary['redirects'] += 1
+        if keep_results:
+            self.validation_results[result['url']] = result
+
+    async def validate_all_urls(self, max_concurrent=20, urls=None, sink=None, keep_results=True,
+                                limit_per_host=0, ttl_dns_cache=300, progress=None, session=None):
+        """
+        Validate all URLs in the sitemap with a fixed pool of max_concurrent workers.
+
+        URLs are pulled lazily from `urls` (any iterable or async iterable; the
+        sitemap itself by default) through a bounded queue, and every result is
+        passed to `sink` as soon as it is ready. With keep_results=False nothing
+        per-URL is retained, so memory is O(max_concurrent) rather than O(URLs).
+        limit_per_host caps connections to a single host (0 means no cap) and
+        DNS answers are cached for ttl_dns_cache seconds. `progress` (a
+        ProgressTracker) receives live counters and can cancel the run.
+        Pass an aiohttp `session` to validate over a pool shared with other
+        work; limit_per_host and ttl_dns_cache then come from its connector.
+        """
+        queue = asyncio.Queue(maxsize=max_concurrent * 2)
+        self.total_urls = 0
+        self.summary = {'accessible': 0, 'errors': 0, 'redirects': 0}
+        track_urls = urls is None and not self.urls
+        if self.resilience is None:
+            self.resilience = ResilienceLayer(max_concurrency=max_concurrent)
+
+        async def produce():
+            try:
+                async for url in self._iter_source_urls(urls):
+                    if progress and progress.stop_requested():
+                        break
+                    if track_urls and keep_results:
+                        self.urls.append(url)
+                    await queue.put(url)
+            except Exception as e:
+                print(f"Error parsing sitemap: {e}")
+            finally:
+                for _ in range(max_concurrent):
+                    await queue.put(None)
+
+        async def work(session):
+            while True:
+                url = await queue.get()
+                if url is None:
+                    return
+                result = await self.validate_url(session, url)
+                self._record(result, keep_results)
+                if progress:
+                    progress.update(self.total_urls, self.summary['accessible'], self.summary['errors'],
+                                    queued=queue.qsize())
+                if sink is not None:
+                    outcome = sink(result)
+                    if asyncio.iscoroutine(outcome):
+                        await outcome
+
+        if session is not None:
+            await asyncio.gather(produce(), *(work(session) for _ in range(max_concurrent)))
+        else:
+            connector = aiohttp.TCPConnector(
+                limit=max_concurrent,
+                limit_per_host=limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=ttl_dns_cache,
+            )
+            async with aiohttp.ClientSession(connector=connector, trace_configs=[self.metrics.trace_config()]) as session:
+                await asyncio.gather(produce(), *(work(session) for _ in range(max_concurrent)))
+
+        if progress:
+            progress.check_cancelled()
+            progress.update(self.total_urls, self.summary['accessible'], self.summary['errors'], force=True)
+
+        print(f"\nValidation Results:")
+        print(f"Total URLs: {self.total_urls}")
+        print(f"Accessible: {self.summary['accessible']}")
+        print(f"Errors: {self.summary['errors']}")
+        print(f"Redirects: {self.summary['redirects']}")
+        resilience = self.resilience.summary()
+        if any(resilience.values()):
+            print(f"Retries: {resilience.get('retries', 0)}, timeouts: {resilience.get('timeouts', 0)}, "
+                  f"circuit trips: {resilience['circuit_trips']}, fast failures: {resilience.get('fast_failures', 0)}")
+
+        return self.validation_results
+    
+    def generate_validation_report(self, output_file="validation_report.jsonl"):
+        """
+        Write the results collected so far as a JSON Lines report (see
+        ValidationReportWriter). To write the report while validating instead,
+        pass a writer's `write` as validate_all_urls' sink.
+        """
+        with ValidationReportWriter(output_file, self.sitemap_file, metrics=self.metrics) as report:
+            for result in self.validation_results.values():
+                report.write(result)
+        return report.report()
 
 def check_sitemap_files():
     """Check if comprehensive sitemap files exist"""
@@ -133,33 +363,37 @@ def check_sitemap_files():
 
 # Usage - Updated to work with comprehensive sitemap generator output
 async def validate_comprehensive_sitemaps():
-    """Validate both comprehensive sitemaps automatically"""
+    """Validate both comprehensive sitemaps at the same time over one connection pool"""
     
     print("🔍 Starting Sitemap Validation...")
     print("=" * 50)
     
-    # Validate main sitemap
-    print("\n📊 Validating comprehensive_sitemap.xml...")
-    validator = SitemapValidator("comprehensive_sitemap.xml")
-    await validator.validate_all_urls()
-    main_report = validator.generate_validation_report("validation_report_main.json")
-    
-    # Validate UK sitemap  
-    print("\n🇬🇧 Validating comprehensive_sitemap_uk.xml...")
-    validator_uk = SitemapValidator("comprehensive_sitemap_uk.xml")
-    await validator_uk.validate_all_urls()
-    uk_report = validator_uk.generate_validation_report("validation_report_uk.json")
+    sitemaps = [
+        ("comprehensive_sitemap.xml", "validation_report_main.jsonl"),
+        ("comprehensive_sitemap_uk.xml", "validation_report_uk.jsonl"),
+    ]
+    print(f"\n📊 Validating {', '.join(sitemap for sitemap, _ in sitemaps)}...")
+
+    async def validate(session, sitemap_file, report_file):
+        validator = SitemapValidator(sitemap_file)
+        with ValidationReportWriter(report_file, sitemap_file, metrics=validator.metrics) as report:
+            await validator.validate_all_urls(session=session, sink=report.write, keep_results=False)
+        return report.report()
+
+    connector = aiohttp.TCPConnector(limit=20 * len(sitemaps), limit_per_host=20, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector, trace_configs=[METRICS.trace_config()]) as session:
+        reports = await asyncio.gather(*(validate(session, sitemap, report) for sitemap, report in sitemaps))
     
     # Combined summary
-    total_urls = main_report['total_urls'] + uk_report['total_urls']
-    total_accessible = main_report['summary']['accessible'] + uk_report['summary']['accessible']
-    total_errors = main_report['summary']['errors'] + uk_report['summary']['errors']
+    total_urls = sum(report['total_urls'] for report in reports)
+    total_accessible = sum(report['summary']['accessible'] for report in reports)
+    total_errors = sum(report['summary']['errors'] for report in reports)
     
     print(f"\n🎉 VALIDATION SUMMARY:")
     print(f"📊 Total URLs Tested: {total_urls}")
     print(f"✅ Accessible URLs: {total_accessible} ({(total_accessible/total_urls)*100:.1f}%)")
     print(f"❌ Error URLs: {total_errors} ({(total_errors/total_urls)*100:.1f}%)")
-    print(f"📁 Reports saved: validation_report_main.json, validation_report_uk.json")
+    print(f"📁 Reports saved: {', '.join(report['report_file'] for report in reports)}")
 
 if __name__ == "__main__":
     if check_sitemap_files():
@@ -0,0 +1,152 @@
+import gzip
+import os
+import tempfile
+import time
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+# sitemaps.org protocol limits per sitemap file
+MAX_URLS_PER_SITEMAP = 50_000
+MAX_BYTES_PER_SITEMAP = 50 * 1024 * 1024
+
+
+class StreamingSitemapWriter:
+    """
+    Incremental sitemap writer with automatic sitemap-index sharding.
+
+    `<url>` entries are serialized as soon as they are added and spooled to a
+    temporary file per sort tier, so memory stays flat however large the site
+    is. close() copies the spools out in tier order, rolling over to a new
+    numbered shard whenever the protocol limits (50,000 URLs / 50MB) would be
+    exceeded. A single shard is written to `filename` as before; several are
+    written as `<stem>-1.xml`, `<stem>-2.xml`, ... plus a sitemap index.
+    """
+
+    def __init__(self, filename, sitemap_base_url, index_filename="sitemap_index.xml", gzip_output=False,
+                 max_urls=MAX_URLS_PER_SITEMAP, max_bytes=MAX_BYTES_PER_SITEMAP, metrics=None):
+        self.filename = filename
+        self.sitemap_base_url = sitemap_base_url.rstrip('/')
+        self.index_filename = index_filename
+        self.gzip_output = gzip_output
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.spools = {}
+        self.count = 0
+        self.files = []
+        # Optional MetricsRegistry: 'sitemap.add' per entry, 'sitemap.close' for writing the shards
+        self.metrics = metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard_spools()
+
+    def add(self, loc, lastmod=None, changefreq=None, priority=None, tier=0):
+        """Serialize one <url> entry to the spool for its tier"""
+        start = time.perf_counter()
+        lines = [f"  <url>\n    <loc>{escape(loc)}</loc>\n"]
+        if lastmod:
+            lines.append(f"    <lastmod>{lastmod}</lastmod>\n")
+        if changefreq:
+            lines.append(f"    <changefreq>{changefreq}</changefreq>\n")
+        if priority:
+            lines.append(f"    <priority>{priority}</priority>\n")
+        lines.append("  </url>\n")
+
+        spool = self.spools.get(tier)
+        if spool is None:
+            spool = self.spools[tier] = tempfile.TemporaryFile()
+        spool.write(''.join(lines).encode('utf-8'))
+        self.count += 1
+        if self.metrics:
+            self.metrics.observe('sitemap.add', time.perf_counter() - start)
+
+    def _shard_path(self, number):
+        stem, ext = os.path.splitext(self.filename)
+        return f"{stem}-{number}{ext}"
+
+    def _open(self, path):
+        if self.gzip_output:
+            return gzip.open(path + '.gz', 'wb')
+        return open(path, 'wb')
+
+    def _final_path(self, path):
+        return path + '.gz' if self.gzip_output else path
+
+    def close(self):
+        """Write the shards (and index when needed); returns the file to submit to search engines"""
+        if self.metrics:
+            with self.metrics.timer('sitemap.close'):
+                return self._close()
+        return self._close()
+
+    def _close(self):
+        header = (XML_DECLARATION + f'<urlset xmlns="{SITEMAP_NS}">\n').encode('utf-8')
+        footer = b"</urlset>"
+
+        shard_paths = []
+        out = None
+        urls_in_shard = bytes_in_shard = 0
+        for tier in sorted(self.spools):
+            spool = self.spools[tier]
+            spool.seek(0)
+            entry = []
+            for line in spool:
+                entry.append(line)
+                if line != b"  </url>\n":
+                    continue
+                data = b''.join(entry)
+                entry = []
+                if out is None or urls_in_shard >= self.max_urls or \
+                        bytes_in_shard + len(data) + len(footer) > self.max_bytes:
+                    if out is not None:
+                        out.write(footer)
+                        out.close()
+                    shard_paths.append(self._shard_path(len(shard_paths) + 1))
+                    out = self._open(shard_paths[-1])
+                    out.write(header)
+                    urls_in_shard, bytes_in_shard = 0, len(header)
+                out.write(data)
+                urls_in_shard += 1
+                bytes_in_shard += len(data)
+
+        if out is None:
+            # Empty sitemap: still emit a valid urlset
+            shard_paths.append(self._shard_path(1))
+            out = self._open(shard_paths[-1])
+            out.write(header)
+        out.write(footer)
+        out.close()
+        self._discard_spools()
+
+        if len(shard_paths) == 1:
+            os.replace(self._final_path(shard_paths[0]), self._final_path(self.filename))
+            self.files = [self._final_path(self.filename)]
+            return self.files[0]
+
+        self.files = [self._final_path(path) for path in shard_paths]
+        self._write_index()
+        return self.index_filename
+
+    def _write_index(self):
+        lastmod = datetime.now().strftime("%Y-%m-%d")
+        with open(self.index_filename, 'w', encoding='utf-8') as f:
+            f.write(XML_DECLARATION)
+            f.write(f'<sitemapindex xmlns="{SITEMAP_NS}">\n')
+            for path in self.files:
+                f.write(f"  <sitemap>\n    <loc>{escape(self.sitemap_base_url + '/' + os.path.basename(path))}</loc>\n"
+                        f"    <lastmod>{lastmod}</lastmod>\n  </sitemap>\n")
+            f.write("</sitemapindex>")
+
+    def _discard_spools(self):
+        for spool in self.spools.values():
+            spool.close()
+        self.spools = {}
+
@@ -0,0 +1,78 @@
+import re
+
+# Keyword groups looked for in a URL's path. A group is present when any of its keywords appears in it.
+DEFAULT_KEYWORDS = {
+    'listing_section': ('/jobs', '/careers'),
+    'listing': ('jobs', 'careers'),
+    'department': ('sales', 'marketing', 'operations', 'technology', 'finance'),
+}
+
+# (groups that must all be present, sort tier, priority, changefreq); the first matching rule wins.
+# 'home' is the site's base URL itself.
+DEFAULT_RULES = [
+    ({'home'}, 0, "1.0", "daily"),
+    ({'listing_section', 'department'}, 1, "0.9", "daily"),
+    ({'listing_section'}, 1, "0.8", "daily"),
+    ({'department'}, 2, "0.9", "daily"),
+    ({'listing'}, 3, "0.8", "daily"),
+    (set(), 3, "0.6", "weekly"),
+]
+
+
+class UrlClassifier:
+    """
+    Assigns (sort_tier, priority, changefreq) to a URL with one regex pass.
+
+    All keywords are compiled into a single alternation (longest first)
+    inside a lookahead, so keywords that overlap are all found; the set of
+    keywords found in a path is looked up in a table filled from the rules
+    the first time that combination is seen. Classifying a URL is
+    therefore one findall over its path plus a dict lookup, however many
+    rules there are. The rules must end with a catch-all.
+    """
+
+    # Table key for the base URL itself; no set of keywords can equal it
+    HOME = object()
+
+    def __init__(self, base_url, keywords=None, rules=None):
+        self.base_url = base_url.rstrip('/')
+        keywords = DEFAULT_KEYWORDS if keywords is None else keywords
+        self.rules = [(frozenset(required), tier, priority, changefreq)
+                      for required, tier, priority, changefreq in (DEFAULT_RULES if rules is None else rules)]
+        if not self.rules or self.rules[-1][0]:
+            raise ValueError("URL classifier rules must end with a catch-all rule (no required groups)")
+
+        # A keyword also counts for every group with a keyword inside it ('/jobs' is also 'jobs')
+        self.groups_for = {}
+        for group, words in keywords.items():
+            for word in words:
+                self.groups_for.setdefault(word, set()).add(group)
+        for word, groups in self.groups_for.items():
+            for other, other_groups in self.groups_for.items():
+                if other != word and other in word:
+                    groups.update(other_groups)
+        self.groups_for = {word: frozenset(groups) for word, groups in self.groups_for.items()}
+        # A lookahead matches at every position, so overlapping keywords ('/jobsales') are all found
+        self.pattern = re.compile('(?=(' + '|'.join(
+            re.escape(word) for word in sorted(self.groups_for, key=len, reverse=True)) + '))') if self.groups_for else None
+        self.table = {}
+
+    def _path(self, url):
+        if url.startswith(self.base_url):
+            return url[len(self.base_url):]
+        rest = url.split('://', 1)[-1]
+        return rest[rest.find('/'):] if '/' in rest else ''
+
+    def classify(self, url):
+        """(sort_tier, priority, changefreq) for url"""
+        # Keyed by the exact set of keywords seen, so the common case is findall plus one dict hit
+        key = self.HOME if url == self.base_url else \
+            frozenset(self.pattern.findall(self._path(url))) if self.pattern is not None else frozenset()
+        outcome = self.table.get(key)
+        if outcome is None:
+            present = frozenset({'home'}) if key is self.HOME else \
+                frozenset(group for word in key for group in self.groups_for[word])
+            outcome = self.table[key] = next(
+                (tier, priority, changefreq) for required, tier, priority, changefreq in self.rules
+                if required <= present)
+        return outcome
@@ -0,0 +1,130 @@
+import hashlib
+from array import array
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# Query parameters that never change page content
+IGNORED_PARAMS = {'gclid', 'fbclid', 'msclkid', 'ref', 'source'}
+IGNORED_PARAM_PREFIXES = ('utm_',)
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so trivially different spellings dedupe to one entry:
+    lowercase scheme/host, no default port, no fragment, no trailing slash,
+    no tracking parameters, no `page=1`, and query parameters in sorted order.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    netloc = host
+    if parts.port is not None and str(parts.port) != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+
+    path = parts.path.rstrip('/')
+
+    params = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in IGNORED_PARAMS and not key.lower().startswith(IGNORED_PARAM_PREFIXES)
+        and not (key == 'page' and value in ('', '1'))
+    ]
+    query = urlencode(sorted(params))
+
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def url_fingerprint(url):
+    """64-bit fingerprint of a (canonical) URL; never 0, which marks an empty slot"""
+    fingerprint = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+    return fingerprint or 1
+
+
+class BloomFilter:
+    """Bit-array Bloom filter probed with double hashing of a 64-bit fingerprint"""
+
+    def __init__(self, capacity=100_000, bits_per_item=10, hashes=7):
+        self.size = max(64, capacity * bits_per_item)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.hashes = hashes
+
+    def _positions(self, fingerprint):
+        low, high = fingerprint & 0xFFFFFFFF, fingerprint >> 32
+        for i in range(self.hashes):
+            yield (low + i * high) % self.size
+
+    def add(self, fingerprint):
+        for position in self._positions(fingerprint):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, fingerprint):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+
+class FingerprintSet:
+    """
+    Compact visited set: 64-bit URL fingerprints in an open-addressing table.
+
+    Each URL costs one or two 8-byte slots instead of a full string plus set
+    entry, roughly a tenth of the memory for typical Finploy URLs. Two URLs
+    colliding on all 64 bits is possible in principle but negligible at crawl
+    sizes. An optional Bloom filter in front answers most "never seen" lookups
+    without probing the table.
+    """
+
+    def __init__(self, capacity=1024, bloom_capacity=None):
+        size = 1
+        while size < capacity * 2:
+            size <<= 1
+        self.table = array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+        self.bloom = BloomFilter(bloom_capacity) if bloom_capacity else None
+
+    def __len__(self):
+        return self.count
+
+    def _slot(self, fingerprint):
+        table, mask = self.table, self.mask
+        index = fingerprint & mask
+        while True:
+            current = table[index]
+            if current == 0 or current == fingerprint:
+                return index
+            index = (index + 1) & mask
+
+    def __contains__(self, url):
+        fingerprint = url_fingerprint(url)
+        if self.bloom is not None and not self.bloom.might_contain(fingerprint):
+            return False
+        return self.table[self._slot(fingerprint)] == fingerprint
+
+    def add(self, url):
+        """Add a URL; returns True if it was not already present"""
+        fingerprint = url_fingerprint(url)
+        index = self._slot(fingerprint)
+        if self.table[index] == fingerprint:
+            return False
+        self.table[index] = fingerprint
+        self.count += 1
+        if self.bloom is not None:
+            self.bloom.add(fingerprint)
+        if self.count * 2 > len(self.table):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self.table
+        self.table = array('Q', bytes(16 * len(old)))
+        self.mask = len(self.table) - 1
+        for fingerprint in old:
+            if fingerprint:
+                self.table[self._slot(fingerprint)] = fingerprint
+
+    def clear(self):
+        self.table = array('Q', bytes(len(self.table) * 8))
+        self.count = 0
+        if self.bloom is not None:
+            self.bloom.bits = bytearray(len(self.bloom.bits))
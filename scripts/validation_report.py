@@ -0,0 +1,179 @@
+import json
+import os
+from datetime import datetime
+
+try:
+    from scripts.results_store import row_category
+except ImportError:  # running from inside scripts/
+    from results_store import row_category
+
+REPORT_FORMAT = 'jsonl-1'
+# Upper bound on lines read for one page, so a selective filter can't turn a request into a full-file scan
+MAX_SCAN_LINES = 10_000
+# The trailer (summary plus per-phase metrics) always fits in this many bytes
+TAIL_BYTES = 16384
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+
+
+class ValidationReportWriter:
+    """
+    Writes a validation report as JSON Lines while validation runs.
+
+    Line 1 is a header (sitemap, date, format), then one compact row per URL
+    as results arrive, then a trailer with the summary counts (and, given a
+    MetricsRegistry, the run's per-phase latency summary). Nothing is held
+    in memory per URL. The report is written to `<output_file>.tmp` and
+    renamed into place on close, so readers only ever see complete reports.
+    Pass `write` as SitemapValidator.validate_all_urls' sink.
+    """
+
+    def __init__(self, output_file, sitemap_file, metrics=None):
+        self.output_file = output_file
+        self.sitemap_file = sitemap_file
+        self.metrics = metrics
+        self.temp_file = output_file + '.tmp'
+        self.validation_date = datetime.now().isoformat()
+        self.total_urls = 0
+        self.summary = {'accessible': 0, 'errors': 0, 'redirects': 0}
+        self.f = open(self.temp_file, 'w', encoding='utf-8')
+        self.f.write(_dumps({
+            'format': REPORT_FORMAT,
+            'sitemap_file': sitemap_file,
+            'validation_date': self.validation_date,
+        }) + '\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, result):
+        row = {
+            'url': result['url'],
+            'status': result['status'],
+            'accessible': result['accessible'],
+            'redirect': result.get('redirect', False),
+        }
+        if result.get('elapsed') is not None:
+            row['elapsed'] = result['elapsed']
+        if result.get('method'):
+            # Checked with a ranged GET because HEAD was refused
+            row['method'] = result['method']
+        if result.get('final_url'):
+            row['final_url'] = result['final_url']
+            # [status, seconds] per hop; the URLs in between are rarely needed and cost the most bytes
+            row['hops'] = [[hop['status'], hop['elapsed']] for hop in result['hops']]
+        if result.get('error'):
+            row['error'] = result['error']
+        self.f.write(_dumps(row) + '\n')
+
+        self.total_urls += 1
+        if row['accessible']:
+            self.summary['accessible'] += 1
+        else:
+            self.summary['errors'] += 1
+        if row['redirect']:
+            self.summary['redirects'] += 1
+
+    def close(self):
+        """Write the trailer and publish the report; returns the summary dict"""
+        trailer = {'total_urls': self.total_urls, 'summary': self.summary}
+        if self.metrics is not None:
+            trailer['metrics'] = self.metrics.snapshot()
+        self.f.write(_dumps(trailer) + '\n')
+        self.f.close()
+        os.replace(self.temp_file, self.output_file)
+        print(f"Validation report saved to {self.output_file}")
+        return self.report()
+
+    def discard(self):
+        self.f.close()
+        if os.path.exists(self.temp_file):
+            os.remove(self.temp_file)
+
+    def report(self):
+        return {
+            'sitemap_file': self.sitemap_file,
+            'validation_date': self.validation_date,
+            'total_urls': self.total_urls,
+            'summary': dict(self.summary),
+            'report_file': self.output_file,
+            'metrics': self.metrics.snapshot() if self.metrics is not None else None,
+        }
+
+
+def read_report_header(path):
+    with open(path, 'rb') as f:
+        return json.loads(f.readline())
+
+
+def read_report_summary(path):
+    """Header plus trailer of a report, read without touching the rows in between"""
+    header = read_report_header(path)
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - TAIL_BYTES, 0))
+        trailer = json.loads(f.read().rstrip(b'\n').rsplit(b'\n', 1)[-1])
+    header.update(trailer)
+    return header
+
+
+def _matches(row, status_filter):
+    if status_filter in (None, '', 'all'):
+        return True
+    if status_filter in ('ok', 'error', 'redirect'):
+        return row_category(row) == status_filter
+    return str(row['status']) == status_filter
+
+
+def read_report_page(path, cursor=None, limit=100, status_filter='all'):
+    """
+    Read up to `limit` rows starting at `cursor` (a byte offset from a
+    previous page; None for the first page). Returns (rows, next_cursor);
+    next_cursor is None once the end of the report is reached. Raises
+    ValueError for a cursor that doesn't point at the start of a row.
+    """
+    if status_filter not in (None, '', 'all', 'ok', 'error', 'redirect') and not str(status_filter).isdigit():
+        raise ValueError(f"Unknown status filter {status_filter!r}")
+
+    rows = []
+    with open(path, 'rb') as f:
+        if cursor is None:
+            f.readline()  # header
+        else:
+            try:
+                offset = int(cursor)
+            except ValueError:
+                raise ValueError(f"Invalid cursor {cursor!r}")
+            size = os.fstat(f.fileno()).st_size
+            if offset <= 0 or offset > size:
+                raise ValueError(f"Invalid cursor {cursor!r}")
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                raise ValueError(f"Invalid cursor {cursor!r}")
+
+        for _ in range(MAX_SCAN_LINES):
+            line = f.readline()
+            if not line:
+                return rows, None
+            row = json.loads(line)
+            if 'url' not in row:
+                return rows, None  # trailer
+            row['category'] = row_category(row)
+            if _matches(row, status_filter):
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        next_cursor = f.tell()
+        # Don't hand out a cursor that only leads to the trailer
+        following = f.readline()
+        if not following or 'url' not in json.loads(following):
+            return rows, None
+        return rows, str(next_cursor)
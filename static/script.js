@@ -11,6 +11,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const sampleGeneratedUrls = document.getElementById('sampleGeneratedUrls');
     const generatedFileName = document.getElementById('generatedFileName');
     const downloadSitemapBtn = document.getElementById('downloadSitemapBtn');
+    const generateProgress = document.getElementById('generateProgress');
+    const generateCancelBtn = document.getElementById('generateCancelBtn');
 
     // Elements for Validate Sitemap
     const validateSitemapForm = document.getElementById('validateSitemapForm');
@@ -26,10 +28,82 @@ document.addEventListener('DOMContentLoaded', function() {
     const validatedFileName = document.getElementById('validatedFileName');
     const showAllValidationBtn = document.getElementById('showAllValidationBtn');
     const downloadValidationReportBtn = document.getElementById('downloadValidationReportBtn');
+    const validateProgress = document.getElementById('validateProgress');
+    const validateCancelBtn = document.getElementById('validateCancelBtn');
 
     let generationChartInstance = null;
     let validationChartInstance = null;
 
+    // Format a progress event from the job's event stream
+    function describeProgress(progress) {
+        const label = progress.phase === 'validate' ? 'Validating' : 'Crawling';
+        return `${label}: ${progress.processed} processed, ${progress.succeeded} OK, ` +
+            `${progress.errors} errors (${(progress.error_rate * 100).toFixed(1)}%), ` +
+            `${progress.queued} queued, ${progress.pages_per_sec} pages/sec`;
+    }
+
+    // Turn a finished job's status into the payload the form handlers expect
+    function jobOutcome(job) {
+        if (job.status === 'succeeded') {
+            return job.result;
+        }
+        if (job.status === 'cancelled') {
+            return { status: 'error', error: 'The job was cancelled.' };
+        }
+        return { status: 'error', error: job.error };
+    }
+
+    // Poll a background job until it finishes, then return its result payload
+    async function pollJob(statusUrl) {
+        while (true) {
+            const job = await (await fetch(statusUrl)).json();
+            if (job.status === 'succeeded' || job.status === 'failed' ||
+                job.status === 'cancelled' || job.status === 'error') {
+                return jobOutcome(job);
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
+    // Follow a background job's progress over Server-Sent Events until it finishes.
+    // Falls back to polling when EventSource is unavailable or the stream drops.
+    async function waitForJob(submitResponse, progressElement, cancelButton) {
+        const data = await submitResponse.json();
+        if (!data.job_id) {
+            return data; // Validation error returned before a job was queued
+        }
+        if (cancelButton) {
+            cancelButton.onclick = () => fetch(data.cancel_url, { method: 'POST' });
+            cancelButton.style.display = 'inline-block';
+        }
+        if (progressElement) {
+            progressElement.textContent = 'Queued...';
+            progressElement.style.display = 'block';
+        }
+        try {
+            if (window.EventSource && data.events_url) {
+                await new Promise(resolve => {
+                    const source = new EventSource(data.events_url);
+                    source.addEventListener('progress', event => {
+                        if (progressElement) progressElement.textContent = describeProgress(JSON.parse(event.data));
+                    });
+                    source.addEventListener('done', () => {
+                        source.close();
+                        resolve();
+                    });
+                    source.onerror = () => {
+                        source.close();
+                        resolve();
+                    };
+                });
+            }
+            return await pollJob(data.status_url);
+        } finally {
+            if (cancelButton) cancelButton.style.display = 'none';
+            if (progressElement) progressElement.style.display = 'none';
+        }
+    }
+
     // Function to render Generation Chart
     function renderGenerationChart(total, time) {
         const ctx = document.getElementById('generationChart').getContext('2d');
@@ -126,7 +200,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 method: 'POST',
                 body: formData
             });
-            const data = await response.json();
+            const data = await waitForJob(response, generateProgress, generateCancelBtn);
 
             if (data.status === 'success') {
                 if (generateStatus) generateStatus.textContent = 'Success';
@@ -143,7 +217,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 });
                 
                 if (downloadSitemapBtn) {
-                    downloadSitemapBtn.href = `/download_sitemap/${data.saved_file}`;
+                    downloadSitemapBtn.href = data.download_url || `/download_sitemap/${data.saved_file}`;
                     downloadSitemapBtn.style.display = 'inline-block'; // Show download button
                 }
 
@@ -188,7 +262,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const response = await fetch('/validate_sitemap_action', {
                 method: 'POST'
             });
-            const data = await response.json();
+            const data = await waitForJob(response, validateProgress, validateCancelBtn);
 
             if (data.status === 'error') {
                 alert(`Validation Error: ${data.error}`);
@@ -218,7 +292,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
                 if (showAllValidationBtn) showAllValidationBtn.style.display = 'inline-block'; // Show "Show All" button
                 if (downloadValidationReportBtn) {
-                    downloadValidationReportBtn.href = `/download_validation_report/${data.saved_file}`;
+                    downloadValidationReportBtn.href = data.download_url || `/download_validation_report/${data.saved_file}`;
                     downloadValidationReportBtn.style.display = 'inline-block'; // Show download button
                 }
 